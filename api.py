@@ -1,10 +1,18 @@
 """
 REST API for ParkVision
 """
-from flask import Flask, jsonify, request, render_template
+from flask import Flask, Response, g, jsonify, request, render_template
 from flask_cors import CORS
 import os
 import base64
+import hmac
+import time
+from pathlib import Path
+
+from src.metrics import CONTENT_TYPE, QUEUE_DEPTH, REQUEST_SECONDS, registry, stage_timer
+from src.log_utils import RateLimitedLogger
+
+log = RateLimitedLogger('parkvision.api')
 
 # Try to import OpenCV with error handling
 try:
@@ -17,7 +25,8 @@ except ImportError as e:
 
 # Import other modules
 try:
-    from src.detector import ParkingDetector
+    from src.detector import ParkingDetector, VEHICLE_NAMES
+    from src.model_registry import models
     from config import get_config
 except ImportError as e:
     print(f"⚠️ Import error: {e}")
@@ -27,6 +36,31 @@ app = Flask(__name__)
 app.config.from_object(get_config())
 CORS(app)
 
+
+@app.before_request
+def start_request_timer():
+    """Track in-flight requests and start the latency timer"""
+    g.request_start = time.perf_counter()
+    QUEUE_DEPTH.labels('http_in_flight').inc()
+
+
+@app.teardown_request
+def stop_request_timer(exc=None):
+    """Record request latency by route"""
+    start = g.pop('request_start', None)
+    if start is None:
+        return
+    QUEUE_DEPTH.labels('http_in_flight').dec()
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics endpoint"""
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
 @app.route('/')
 def index():
     """Main web interface"""
@@ -53,49 +87,55 @@ def upload_image():
             }), 500
         
         # Read and process image
-        image_bytes = file.read()
+        with stage_timer('upload', 'read'):
+            image_bytes = file.read()
         
         if not cv2_available:
             return jsonify({'error': 'OpenCV not available'}), 500
             
         import numpy as np
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        with stage_timer('upload', 'decode'):
+            nparr = np.frombuffer(image_bytes, np.uint8)
+            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
         
         if image is None:
             return jsonify({'error': 'Invalid image format'}), 400
         
         # Run detection
-        results = detector.detect(image)
-        counts = detector.count_spaces(results)
-        
-        # Get detection details
-        detections = []
-        if hasattr(results, 'boxes') and results.boxes is not None and len(results.boxes) > 0:
-            for box in results.boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                conf = float(box.conf[0])
-                cls = int(box.cls[0])
-                
-                # Only include vehicles
-                if cls in [2, 5, 7]:  # car, bus, truck
-                    class_name = detector.class_names[cls] if cls < len(detector.class_names) else 'vehicle'
-                    detections.append({
-                        'bbox': [x1, y1, x2, y2],
-                        'confidence': conf,
-                        'class': class_name,
-                        'class_id': cls
-                    })
+        with stage_timer('upload', 'inference'):
+            results = detector.detect(image)
+        with stage_timer('upload', 'postprocess'):
+            counts = detector.count_spaces(results)
+            
+            # Get detection details
+            detections = []
+            if hasattr(results, 'boxes') and results.boxes is not None and len(results.boxes) > 0:
+                for box in results.boxes:
+                    x1, y1, x2, y2 = map(int, box.xyxy[0])
+                    conf = float(box.conf[0])
+                    cls = int(box.cls[0])
+                    
+                    # Only include vehicles (or spaces, for parking models)
+                    names = getattr(results, 'names', None) or {}
+                    class_name = names.get(cls, 'vehicle')
+                    if class_name in VEHICLE_NAMES or class_name in ('empty', 'occupied'):
+                        detections.append({
+                            'bbox': [x1, y1, x2, y2],
+                            'confidence': conf,
+                            'class': class_name,
+                            'class_id': cls
+                        })
         
-        return jsonify({
-            'success': True,
-            'message': f'Detected {counts["total"]} objects',
-            'empty': counts.get('empty', 0),
-            'occupied': counts.get('occupied', 0), 
-            'total': counts['total'],
-            'detections': detections,
-            'filename': file.filename
-        })
+        with stage_timer('upload', 'encode'):
+            return jsonify({
+                'success': True,
+                'message': f'Detected {counts["total"]} objects',
+                'empty': counts.get('empty', 0),
+                'occupied': counts.get('occupied', 0), 
+                'total': counts['total'],
+                'detections': detections,
+                'filename': file.filename
+            })
         
     except Exception as e:
         return jsonify({
@@ -106,108 +146,47 @@ def upload_image():
             'total': 0
         }), 500
 
-# Initialize detector with error handling - start with pretrained model
+# Initialize detector with error handling
 detector = None
 model_loaded = False
 
-# Initialize real YOLOv8 detector
-detector = None
-model_loaded = False
-
-if cv2_available:
+if cv2_available and ParkingDetector is not None:
     try:
-        from ultralytics import YOLO
         import torch
         
         # Fix PyTorch 2.6 security issue by adding safe globals
         print("🔄 Setting up PyTorch safe globals...")
         
         # Add all required ultralytics classes to safe globals
-        torch.serialization.add_safe_globals([
-            'ultralytics.nn.tasks.DetectionModel',
-            'ultralytics.nn.modules.head.Detect', 
-            'ultralytics.nn.modules.conv.Conv',
-            'ultralytics.nn.modules.block.C2f',
-            'ultralytics.nn.modules.block.SPPF',
-            'ultralytics.nn.modules.conv.DWConv',
-            'ultralytics.nn.modules.transformer.TransformerBlock',
-            'ultralytics.nn.modules.block.Bottleneck',
-            'torch.nn.modules.upsampling.Upsample',
-            'torch.nn.modules.pooling.MaxPool2d',
-            'torch.nn.modules.activation.SiLU'
-        ])
-        
-        print("🔄 Loading YOLOv8n model with safe globals...")
-        
-        # Create a real detector class
-        class RealDetector:
-            def __init__(self):
-                # Load model with older torch version (should work)
-                print("📥 Downloading YOLOv8n model...")
-                self.model = YOLO('yolov8n.pt')
-                # COCO class names - cars are class 2, trucks are 7, buses are 5
-                self.vehicle_classes = [2, 5, 7]  # car, bus, truck
-                self.class_names = ['person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck']
-                print("🚗 Vehicle detection ready")
-                
-            def detect(self, image):
-                # Run YOLOv8 detection with lower confidence for more detections
-                try:
-                    results = self.model(image, conf=0.25, verbose=False)
-                    return results[0] if results else None
-                except Exception as e:
-                    print(f"Detection error: {e}")
-                    return None
-                
-            def count_spaces(self, results):
-                counts = {'empty': 0, 'occupied': 0, 'total': 0}
-                
-                if results and hasattr(results, 'boxes') and results.boxes is not None and len(results.boxes) > 0:
-                    vehicle_count = 0
-                    all_detections = len(results.boxes)
-                    
-                    for box in results.boxes:
-                        cls = int(box.cls[0])
-                        conf = float(box.conf[0])
-                        
-                        # Count vehicles with good confidence
-                        if cls in self.vehicle_classes and conf > 0.3:
-                            vehicle_count += 1
-                    
-                    print(f"🔍 Detected {vehicle_count} vehicles out of {all_detections} total objects")
-                    
-                    # Each vehicle represents an occupied parking space
-                    counts['occupied'] = vehicle_count
-                    # Estimate total spaces based on image size and vehicle count
-                    estimated_total = max(vehicle_count * 2, 8)  # At least 8 spaces
-                    counts['total'] = min(estimated_total, 20)  # Max 20 spaces
-                    counts['empty'] = counts['total'] - counts['occupied']
-                else:
-                    print("🔍 No vehicles detected - parking lot appears empty")
-                    # No vehicles detected - assume parking lot is mostly empty
-                    counts['empty'] = 12
-                    counts['occupied'] = 0
-                    counts['total'] = 12
-                
-                return counts
+        if hasattr(torch.serialization, 'add_safe_globals'):
+            torch.serialization.add_safe_globals([
+                'ultralytics.nn.tasks.DetectionModel',
+                'ultralytics.nn.modules.head.Detect', 
+                'ultralytics.nn.modules.conv.Conv',
+                'ultralytics.nn.modules.block.C2f',
+                'ultralytics.nn.modules.block.SPPF',
+                'ultralytics.nn.modules.conv.DWConv',
+                'ultralytics.nn.modules.transformer.TransformerBlock',
+                'ultralytics.nn.modules.block.Bottleneck',
+                'torch.nn.modules.upsampling.Upsample',
+                'torch.nn.modules.pooling.MaxPool2d',
+                'torch.nn.modules.activation.SiLU'
+            ])
         
-        # Try to create detector with safe globals
-        try:
-            detector = RealDetector()
-            model_loaded = True
-            print("✅ Real YOLOv8n detector loaded successfully")
-        except Exception as safe_error:
-            print(f"⚠️ Safe globals failed: {safe_error}")
-            print("🔄 Trying with context manager...")
-            
-            # Alternative: Use context manager approach
-            with torch.serialization.safe_globals(['ultralytics.nn.tasks.DetectionModel']):
-                detector = RealDetector()
-                model_loaded = True
-                print("✅ YOLOv8n loaded with context manager")
+        # Weights come from the shared model registry; falls back to
+        # MODEL_FALLBACK_PATH (yolov8n, vehicle counting) if the configured
+        # model can't be loaded
+        print(f"🔄 Loading model {app.config['MODEL_PATH']}...")
+        detector = ParkingDetector(app.config['MODEL_PATH'], conf_threshold=0.25,
+                                   imgsz=app.config['IMAGE_SIZE'],
+                                   fallback_path=app.config['MODEL_FALLBACK_PATH'])
+        model_loaded = True
+        print("✅ YOLOv8 detector loaded successfully")
         
     except Exception as e:
         print(f"⚠️ Failed to load YOLOv8: {e}")
+        if not app.config['FALLBACK_DETECTOR']:
+            raise
         print("🔄 Falling back to basic detection...")
         
         # Fallback detector
@@ -219,6 +198,7 @@ if cv2_available:
                 class SimpleResults:
                     def __init__(self):
                         self.boxes = []
+                        self.names = {0: 'vehicle'}
                 return SimpleResults()
                 
             def count_spaces(self, results):
@@ -239,10 +219,88 @@ else:
     print("❌ OpenCV not available")
 
 
+def check_api_key():
+    """Return an error response unless the request carries the configured API_KEY"""
+    expected = app.config.get('API_KEY')
+    if not expected:
+        # Admin endpoints stay disabled until a key is configured
+        return jsonify({'error': 'API_KEY not configured'}), 403
+    provided = request.headers.get('X-API-Key') or ''
+    if not hmac.compare_digest(provided.encode(), expected.encode()):
+        return jsonify({'error': 'Invalid API key'}), 401
+    return None
+
+
+def resolve_model_path(path):
+    """
+    Resolve a requested model path inside MODEL_DIR
+    
+    Returns:
+        Path or None: The resolved file, or None if it is not an existing
+        file under the models directory
+    """
+    model_dir = Path(app.config['MODEL_DIR']).resolve()
+    candidate = Path(path)
+    if not candidate.is_absolute():
+        candidate = model_dir / candidate
+    candidate = candidate.resolve()
+    if not candidate.is_file() or not candidate.is_relative_to(model_dir):
+        return None
+    return candidate
+
+
+@app.route('/api/model', methods=['GET'])
+def model_info():
+    """Active model versions per registry slot"""
+    return jsonify({
+        'slot': getattr(detector, 'model_name', None),
+        'slots': models.slots() if ParkingDetector is not None else {}
+    })
+
+
+@app.route('/api/model', methods=['POST'])
+def swap_model():
+    """
+    Hot-swap the API detector's model without a restart
+    
+    Requires the X-API-Key header; refused when API_KEY is not set.
+    
+    Request (JSON):
+        - path: model file to load, inside MODEL_DIR
+        - version: optional version label
+    """
+    denied = check_api_key()
+    if denied:
+        return denied
+    if not hasattr(detector, 'model_name'):
+        return jsonify({'error': 'No swappable model loaded'}), 500
+    
+    data = request.get_json(silent=True) or {}
+    path = data.get('path')
+    if not path:
+        return jsonify({'error': 'No model path provided'}), 400
+    resolved = resolve_model_path(path)
+    if resolved is None:
+        return jsonify({'error': 'Model path must be an existing file in the models directory'}), 400
+    path = str(resolved)
+    
+    try:
+        handle = models.swap(detector.model_name, path, data.get('version'))
+    except Exception as e:
+        log.error('model_swap_failed', path=path, error=str(e))
+        return jsonify({'error': f'Model load failed: {e}'}), 500
+    
+    return jsonify({'success': True, 'model': handle.info()})
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    detector_type = "YOLOv8n Real Detector" if model_loaded else "No Detector"
+    if hasattr(detector, 'handle'):
+        handle = detector.handle
+        detector_type = f"YOLOv8 {handle.version}" + (" (fallback)" if models.is_fallback(detector.model_name) else "")
+    else:
+        detector_type = "Fallback Detector" if model_loaded else "No Detector"
     return jsonify({
         'status': 'healthy' if model_loaded else 'model_error',
         'version': '1.0.0',
@@ -272,51 +330,56 @@ def detect():
             return jsonify({'error': 'Model not loaded'}), 500
             
         # Get image from request
-        if 'image' in request.files:
-            file = request.files['image']
-            image_bytes = file.read()
-        elif 'image' in request.json:
-            image_data = request.json['image']
-            image_bytes = base64.b64decode(image_data)
-        else:
-            return jsonify({'error': 'No image provided'}), 400
+        with stage_timer('api', 'read'):
+            if 'image' in request.files:
+                file = request.files['image']
+                image_bytes = file.read()
+            elif 'image' in request.json:
+                image_data = request.json['image']
+                image_bytes = base64.b64decode(image_data)
+            else:
+                return jsonify({'error': 'No image provided'}), 400
         
         # Decode image
         if not cv2_available:
             return jsonify({'error': 'OpenCV not available'}), 500
             
         import numpy as np
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        with stage_timer('api', 'decode'):
+            nparr = np.frombuffer(image_bytes, np.uint8)
+            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
         
         if image is None:
             return jsonify({'error': 'Invalid image'}), 400
         
         # Run detection
-        results = detector.detect(image)
-        counts = detector.count_spaces(results)
-        
-        # Get detection details
-        detections = []
-        if results.boxes is not None:
-            for box in results.boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                conf = float(box.conf[0])
-                cls = int(box.cls[0])
-                
-                detections.append({
-                    'bbox': [x1, y1, x2, y2],
-                    'confidence': conf,
-                    'class': detector.class_names[cls],
-                    'class_id': cls
-                })
+        with stage_timer('api', 'inference'):
+            results = detector.detect(image)
+        with stage_timer('api', 'postprocess'):
+            counts = detector.count_spaces(results)
+            
+            # Get detection details
+            detections = []
+            if results.boxes is not None:
+                for box in results.boxes:
+                    x1, y1, x2, y2 = map(int, box.xyxy[0])
+                    conf = float(box.conf[0])
+                    cls = int(box.cls[0])
+                    
+                    detections.append({
+                        'bbox': [x1, y1, x2, y2],
+                        'confidence': conf,
+                        'class': results.names.get(cls, str(cls)),
+                        'class_id': cls
+                    })
         
-        return jsonify({
-            'empty': counts['empty'],
-            'occupied': counts['occupied'],
-            'total': counts['total'],
-            'detections': detections
-        })
+        with stage_timer('api', 'encode'):
+            return jsonify({
+                'empty': counts['empty'],
+                'occupied': counts['occupied'],
+                'total': counts['total'],
+                'detections': detections
+            })
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -0,0 +1,335 @@
+"""
+Benchmark suite for ParkVision
+
+Runs fully offline against synthetic frames (or a local sample video) and a
+local model file, and writes the results to JSON so runs can be compared.
+
+Usage:
+    python benchmark.py --model models/yolov8n.pt --output bench.json
+    python benchmark.py --model models/yolov8n.pt --video data/sample.mp4
+    python benchmark.py --model models/yolov8n.pt --baseline bench.json
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from src.sim_camera import load_video_frames, make_synthetic_frames
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list
+
+    Args:
+        sorted_values: Values sorted in ascending order
+        pct: Percentile between 0 and 100
+
+    Returns:
+        float: Percentile value (0.0 for an empty list)
+    """
+    if not sorted_values:
+        return 0.0
+    rank = int(round(pct / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[min(max(rank, 0), len(sorted_values) - 1)]
+
+
+def summarize(samples, wall_time=None):
+    """
+    Summarize latency samples
+
+    Args:
+        samples: Latencies in seconds
+        wall_time: Wall-clock duration of the run; used for throughput when
+            samples overlap (concurrent load). Defaults to the sample sum.
+
+    Returns:
+        dict: Count, mean/min/max and percentile latencies in ms, throughput
+    """
+    ms = sorted(s * 1000.0 for s in samples)
+    total = wall_time if wall_time is not None else sum(samples)
+    return {
+        'count': len(ms),
+        'mean_ms': sum(ms) / len(ms) if ms else 0.0,
+        'min_ms': ms[0] if ms else 0.0,
+        'p50_ms': percentile(ms, 50),
+        'p90_ms': percentile(ms, 90),
+        'p95_ms': percentile(ms, 95),
+        'p99_ms': percentile(ms, 99),
+        'max_ms': ms[-1] if ms else 0.0,
+        'throughput_per_s': len(ms) / total if total > 0 else 0.0
+    }
+
+
+def write_video(frames, path, fps=30):
+    """Write frames to an mp4 file for the video pipeline benchmark"""
+    height, width = frames[0].shape[:2]
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    writer = cv2.VideoWriter(str(path), fourcc, fps, (width, height))
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+
+
+def bench_detector(detector, frames, iterations, warmup):
+    """
+    Time each ParkingDetector stage separately, then process_frame end-to-end
+
+    Args:
+        detector: ParkingDetector instance
+        frames: Input frames (cycled)
+        iterations: Measured iterations per stage
+        warmup: Untimed iterations to run first
+
+    Returns:
+        dict: Summary per stage
+    """
+    for i in range(warmup):
+        detector.process_frame(frames[i % len(frames)])
+
+    detect_s, count_s, draw_s, frame_s = [], [], [], []
+    for i in range(iterations):
+        frame = frames[i % len(frames)]
+
+        start = time.perf_counter()
+        results = detector.detect(frame)
+        detect_s.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        detector.count_spaces(results)
+        count_s.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        detector.draw_detections(frame, results)
+        draw_s.append(time.perf_counter() - start)
+
+    for i in range(iterations):
+        start = time.perf_counter()
+        detector.process_frame(frames[i % len(frames)])
+        frame_s.append(time.perf_counter() - start)
+
+    return {
+        'detector.detect': summarize(detect_s),
+        'detector.count_spaces': summarize(count_s),
+        'detector.draw_detections': summarize(draw_s),
+        'detector.process_frame': summarize(frame_s)
+    }
+
+
+def bench_video(model_path, frames, video_path=None):
+    """
+    Measure VideoProcessor.process_video throughput
+
+    Args:
+        model_path: Local model file
+        frames: Frames used to build a temporary video when no video is given
+        video_path: Optional local sample video
+
+    Returns:
+        dict: Frames, elapsed seconds and FPS
+    """
+    from src.detector import ParkingDetector
+    from src.video_processor import VideoProcessor
+
+    processor = VideoProcessor(detector=ParkingDetector(model_path, fallback_path=None))
+    if video_path:
+        return {'video.process_video': processor.process_video(str(video_path), display=False)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'bench.mp4'
+        write_video(frames, path)
+        stats = processor.process_video(str(path), display=False)
+    return {'video.process_video': stats}
+
+
+def bench_api(model_path, frames, total_requests, concurrency, warmup):
+    """
+    Measure /api/detect latency under concurrent load via the Flask test client
+
+    Args:
+        model_path: Local model file used by the API detector
+        frames: Frames sent as base64 JPEG payloads (cycled)
+        total_requests: Measured requests
+        concurrency: Number of concurrent clients
+        warmup: Untimed requests to send first
+
+    Returns:
+        dict: Latency summary plus error count
+    """
+    # Point the API at the local model (read by Config at import time); the
+    # registry hands it the weights already loaded by the detector benchmark.
+    # No fallbacks: a missing model must fail the run, not download yolov8n
+    # or serve random counts
+    os.environ['MODEL_PATH'] = str(model_path)
+    os.environ['MODEL_FALLBACK_PATH'] = ''
+    os.environ['FALLBACK_DETECTOR'] = 'False'
+    import api
+
+    if api.detector is None:
+        raise RuntimeError('API detector not initialised (OpenCV unavailable?)')
+
+    payloads = []
+    for frame in frames:
+        ok, buffer = cv2.imencode('.jpg', frame)
+        if ok:
+            payloads.append({'image': base64.b64encode(buffer.tobytes()).decode('ascii')})
+
+    def send(i):
+        client = api.app.test_client()
+        start = time.perf_counter()
+        response = client.post('/api/detect', json=payloads[i % len(payloads)])
+        return time.perf_counter() - start, response.status_code
+
+    for i in range(warmup):
+        send(i)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(send, range(total_requests)))
+    wall_time = time.perf_counter() - start
+
+    # Failed requests return fast; keep them out of the latency figures
+    summary = summarize([latency for latency, status in outcomes if status == 200], wall_time)
+    summary['concurrency'] = concurrency
+    summary['errors'] = sum(1 for _, status in outcomes if status != 200)
+    return {'api.detect': summary}
+
+
+def compare(current, baseline, tolerance):
+    """
+    Compare p50 latencies (or FPS for throughput runs) and error counts
+    against a baseline
+
+    Args:
+        current: Results dict from this run
+        baseline: Results dict from a previous run
+        tolerance: Allowed relative slowdown (0.10 = 10%)
+
+    Returns:
+        list: Human-readable regression descriptions
+    """
+    regressions = []
+    for name, stats in current['results'].items():
+        old = baseline.get('results', {}).get(name)
+        if not old:
+            continue
+        if stats.get('errors', 0) > old.get('errors', 0):
+            regressions.append(f"{name}: errors {old.get('errors', 0)} -> {stats['errors']}")
+        if 'p50_ms' in stats and old.get('p50_ms'):
+            if stats['p50_ms'] > old['p50_ms'] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: p50 {old['p50_ms']:.2f}ms -> {stats['p50_ms']:.2f}ms")
+        elif 'fps' in stats and old.get('fps'):
+            if stats['fps'] < old['fps'] * (1 - tolerance):
+                regressions.append(
+                    f"{name}: {old['fps']:.2f} FPS -> {stats['fps']:.2f} FPS")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='ParkVision benchmark suite')
+    parser.add_argument('--model', default=os.environ.get('MODEL_PATH') or 'models/best.pt',
+                        help='Local model file (never downloaded)')
+    parser.add_argument('--video', help='Local sample video instead of synthetic frames')
+    parser.add_argument('--frames', type=int, default=30, help='Number of distinct input frames')
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--requests', type=int, default=100, help='Measured /api/detect requests')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--skip-video', action='store_true')
+    parser.add_argument('--skip-api', action='store_true')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', help='Previous results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Allowed relative slowdown before flagging a regression')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if not Path(args.model).is_file():
+        print(f"❌ Model not found: {args.model} (benchmarks only use local weights)")
+        return 2
+
+    # Read the baseline up front in case --output points at the same file
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.video:
+        frames = load_video_frames(args.video, args.frames)
+    else:
+        frames = make_synthetic_frames(args.frames, args.width, args.height)
+
+    from src.detector import ParkingDetector
+
+    print(f"🔄 Benchmarking detector with {args.model}...")
+    detector = ParkingDetector(args.model, fallback_path=None)
+    results = bench_detector(detector, frames, args.iterations, args.warmup)
+
+    if not args.skip_video:
+        print("🔄 Benchmarking video pipeline...")
+        results.update(bench_video(args.model, frames, args.video))
+
+    if not args.skip_api:
+        print("🔄 Benchmarking /api/detect...")
+        results.update(bench_api(args.model, frames, args.requests, args.concurrency, args.warmup))
+
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'platform': {
+            'python': platform.python_version(),
+            'system': platform.platform(),
+            'processor': platform.processor(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__
+        },
+        'config': vars(args),
+        'results': results
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for name, stats in results.items():
+        if 'p50_ms' in stats:
+            print(f"{name:28s} p50={stats['p50_ms']:8.2f}ms  p99={stats['p99_ms']:8.2f}ms  "
+                  f"{stats['throughput_per_s']:8.1f}/s")
+        else:
+            print(f"{name:28s} {stats['fps']:8.2f} FPS over {stats['frames']} frames")
+    print(f"✅ Results saved to {args.output}")
+
+    failed = {name: stats['errors'] for name, stats in results.items() if stats.get('errors')}
+    if failed:
+        print("❌ Failed requests:")
+        for name, errors in failed.items():
+            print(f"  - {name}: {errors} errors")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("❌ Performance regressions:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("✅ No regressions against baseline")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -16,6 +16,9 @@ class Config:
     
     # Model settings
     MODEL_PATH = os.environ.get('MODEL_PATH') or 'models/best.pt'
+    MODEL_DIR = os.environ.get('MODEL_DIR') or 'models'  # hot-swapped models must live here
+    MODEL_FALLBACK_PATH = os.environ.get('MODEL_FALLBACK_PATH', 'yolov8n.pt') or None  # empty: no fallback model
+    FALLBACK_DETECTOR = os.environ.get('FALLBACK_DETECTOR', 'True').lower() == 'true'  # random counts if no model loads
     CONFIDENCE_THRESHOLD = float(os.environ.get('CONFIDENCE_THRESHOLD') or 0.5)
     
     # Camera settings
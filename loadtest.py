@@ -0,0 +1,492 @@
+"""
+Load-testing harness for ParkVision
+
+Drives /api/detect, /upload and /video_feed with a replayable request trace
+and runs many simulated cameras through the video pipeline, then reports
+throughput, latency distribution, dropped frames and memory growth. No real
+cameras or network access are needed: the apps run in-process against
+simulated camera sources unless --url points at a running server.
+
+Usage:
+    python loadtest.py --model models/yolov8n.pt --duration 30 --cameras 8
+    python loadtest.py --model models/yolov8n.pt --save-trace trace.jsonl
+    python loadtest.py --model models/yolov8n.pt --replay trace.jsonl
+    python loadtest.py --url http://localhost:5000 --replay trace.jsonl --cameras 0
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import cv2
+
+from benchmark import summarize
+from src.metrics import PROCESS_RSS, process_rss_bytes
+from src.sim_camera import make_synthetic_frames
+
+
+def scrape_rss(base_url, timeout=5):
+    """
+    Server RSS in bytes, scraped from its /metrics endpoint
+
+    Returns:
+        float or None: None if the server could not be scraped
+    """
+    try:
+        with urllib.request.urlopen(f"{base_url.rstrip('/')}/metrics", timeout=timeout) as response:
+            text = response.read().decode('utf-8', 'replace')
+    except (OSError, ValueError):
+        return None
+    for line in text.splitlines():
+        if line.startswith(PROCESS_RSS.name + ' '):
+            return float(line.split()[1])
+    return None
+
+
+class MemorySampler:
+    """Background thread recording RSS once per interval"""
+
+    def __init__(self, read=process_rss_bytes, interval=1.0):
+        """
+        Args:
+            read: Callable returning RSS in bytes, or None when unavailable
+            interval: Seconds between samples
+        """
+        self.read = read
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='memory-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._sample()
+            self._stop.wait(self.interval)
+
+    def _sample(self):
+        rss = self.read()
+        if rss is not None:
+            self.samples.append((time.perf_counter(), rss))
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def report(self):
+        if not self.samples:
+            return {}
+        values = [rss for _, rss in self.samples]
+        mb = 1024 * 1024
+        return {
+            'start_mb': values[0] / mb,
+            'end_mb': values[-1] / mb,
+            'peak_mb': max(values) / mb,
+            'growth_mb': (values[-1] - values[0]) / mb,
+            'samples': len(values)
+        }
+
+
+# --- Request traces ---------------------------------------------------------
+
+def build_trace(duration, detect_rate, upload_rate, stream_rate, stream_seconds,
+                frames, width, height, seed=0):
+    """
+    Generate a reproducible request schedule with Poisson arrivals
+
+    Args:
+        duration: Seconds covered by the trace
+        detect_rate: /api/detect requests per second
+        upload_rate: /upload requests per second
+        stream_rate: New /video_feed clients per second
+        stream_seconds: How long each /video_feed client stays connected
+        frames: Number of distinct payload images
+        width: Payload image width
+        height: Payload image height
+        seed: Random seed
+
+    Returns:
+        dict: {'header': {...}, 'events': [...]}
+    """
+    rng = random.Random(seed)
+    events = []
+    for endpoint, rate in (('detect', detect_rate), ('upload', upload_rate),
+                           ('video_feed', stream_rate)):
+        if rate <= 0:
+            continue
+        t = rng.expovariate(rate)
+        while t < duration:
+            event = {'t': round(t, 4), 'endpoint': endpoint, 'frame': rng.randrange(frames)}
+            if endpoint == 'video_feed':
+                event['hold'] = stream_seconds
+            events.append(event)
+            t += rng.expovariate(rate)
+    events.sort(key=lambda e: e['t'])
+
+    header = {'seed': seed, 'duration': duration, 'frames': frames,
+              'width': width, 'height': height}
+    return {'header': header, 'events': events}
+
+
+def save_trace(trace, path):
+    """Write a trace as JSON lines: the header first, then one event per line"""
+    with open(path, 'w') as f:
+        f.write(json.dumps(trace['header']) + '\n')
+        for event in trace['events']:
+            f.write(json.dumps(event) + '\n')
+
+
+def load_trace(path):
+    """Read a trace written by save_trace"""
+    with open(path) as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    return {'header': lines[0], 'events': lines[1:]}
+
+
+def build_payloads(header):
+    """Rebuild the JPEG payloads a trace refers to from its header"""
+    frames = make_synthetic_frames(header['frames'], header['width'], header['height'],
+                                   header['seed'])
+    payloads = []
+    for frame in frames:
+        ok, buffer = cv2.imencode('.jpg', frame)
+        if not ok:
+            raise RuntimeError('Failed to encode payload frame')
+        payloads.append(buffer.tobytes())
+    return payloads
+
+
+# --- Clients ------------------------------------------------------------------
+
+FRAME_MARKER = b'--frame'
+
+
+def count_frames(chunks, hold):
+    """Consume a multipart stream for `hold` seconds and count frames"""
+    frames = 0
+    tail = b''
+    deadline = time.perf_counter() + hold
+    for chunk in chunks:
+        data = tail + chunk
+        frames += data.count(FRAME_MARKER)
+        # Keep just enough to catch a marker split across chunks, never a whole one
+        tail = data[-(len(FRAME_MARKER) - 1):]
+        if time.perf_counter() >= deadline:
+            break
+    return frames
+
+
+class InProcessClient:
+    """Calls the Flask apps directly through their test clients"""
+
+    def __init__(self, api_app, stream_app):
+        self.api_app = api_app
+        self.stream_app = stream_app
+
+    def detect(self, payload):
+        body = {'image': base64.b64encode(payload).decode('ascii')}
+        response = self.api_app.test_client().post('/api/detect', json=body)
+        return response.status_code
+
+    def upload(self, payload):
+        from io import BytesIO
+        data = {'file': (BytesIO(payload), 'frame.jpg')}
+        response = self.api_app.test_client().post('/upload', data=data,
+                                                   content_type='multipart/form-data')
+        return response.status_code
+
+    def video_feed(self, hold):
+        response = self.stream_app.test_client().get('/video_feed', buffered=False)
+        try:
+            return response.status_code, count_frames(response.response, hold)
+        finally:
+            response.close()
+
+
+class HttpClient:
+    """Calls a running server over HTTP using only the standard library"""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def _send(self, request):
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def detect(self, payload):
+        body = json.dumps({'image': base64.b64encode(payload).decode('ascii')}).encode()
+        request = urllib.request.Request(f"{self.base_url}/api/detect", data=body,
+                                         headers={'Content-Type': 'application/json'})
+        return self._send(request)
+
+    def upload(self, payload):
+        boundary = uuid.uuid4().hex
+        body = (f'--{boundary}\r\n'
+                'Content-Disposition: form-data; name="file"; filename="frame.jpg"\r\n'
+                'Content-Type: image/jpeg\r\n\r\n').encode() + payload + \
+            f'\r\n--{boundary}--\r\n'.encode()
+        request = urllib.request.Request(
+            f"{self.base_url}/upload", data=body,
+            headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+        return self._send(request)
+
+    def video_feed(self, hold):
+        try:
+            response = urllib.request.urlopen(f"{self.base_url}/video_feed", timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            return e.code, 0
+        with response:
+            chunks = iter(lambda: response.read1(65536), b'')
+            return response.status, count_frames(chunks, hold)
+
+
+# --- Scenarios ----------------------------------------------------------------
+
+def replay(client, trace, payloads, concurrency, stream_fps):
+    """
+    Replay a trace open-loop: each request starts at its scheduled offset
+
+    Args:
+        client: InProcessClient or HttpClient
+        trace: Trace dict from build_trace/load_trace
+        payloads: JPEG bytes indexed by event['frame']
+        concurrency: Worker threads issuing requests
+        stream_fps: Expected /video_feed frame rate, for dropped-frame counts
+
+    Returns:
+        dict: Per-endpoint latency summaries, errors, schedule lag and stream frames
+    """
+    results = {'detect': [], 'upload': [], 'video_feed': []}
+    lags = []
+    lock = threading.Lock()
+
+    def run(event, scheduled):
+        started = time.perf_counter()
+        endpoint = event['endpoint']
+        frames = None
+        try:
+            if endpoint == 'video_feed':
+                status, frames = client.video_feed(event['hold'])
+            else:
+                status = getattr(client, endpoint)(payloads[event['frame']])
+        except Exception:
+            status = 0
+        outcome = (time.perf_counter() - started, status, frames, event.get('hold'))
+        with lock:
+            results[endpoint].append(outcome)
+            lags.append(started - scheduled)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for event in trace['events']:
+            scheduled = start + event['t']
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(run, event, scheduled)
+    wall_time = time.perf_counter() - start
+
+    report = {'wall_time_s': wall_time, 'schedule_lag': summarize(lags, wall_time)}
+    for endpoint, outcomes in results.items():
+        if not outcomes:
+            continue
+        summary = summarize([latency for latency, _, _, _ in outcomes], wall_time)
+        summary['errors'] = sum(1 for _, status, _, _ in outcomes if status != 200)
+        if endpoint == 'video_feed':
+            received = sum(frames or 0 for _, _, frames, _ in outcomes)
+            expected = int(sum(stream_fps * (hold or 0) for _, _, _, hold in outcomes))
+            summary['frames_received'] = received
+            summary['frames_expected'] = expected
+            summary['frames_dropped'] = max(0, expected - received)
+        report[endpoint] = summary
+    return report
+
+
+def run_cameras(count, source, duration, qos_enabled):
+    """
+    Run `count` simulated cameras through VideoProcessor concurrently
+
+    Args:
+        count: Number of cameras
+        source: 'sim:' source template; '{seed}' is replaced per camera
+        duration: Seconds of video per camera
+        qos_enabled: Share a QoSController between the cameras
+
+    Returns:
+        dict: Per-camera and aggregate frames, FPS and dropped frames
+    """
+    from src.detector import ParkingDetector
+    from src.qos import QoSController
+    from src.video_processor import VideoProcessor
+
+    qos = QoSController.from_env() if qos_enabled else None
+    detector = ParkingDetector(os.environ['MODEL_PATH'], fallback_path=None)
+    processor = VideoProcessor(qos=qos, detector=detector)
+
+    def camera(i):
+        cam_source = source.format(seed=i)
+        separator = '&' if '?' in cam_source else '?'
+        cam_source = f"{cam_source}{separator}duration={duration}"
+        return processor.process_video(cam_source, display=False, camera_id=f"sim{i}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        stats = list(pool.map(camera, range(count)))
+    wall_time = time.perf_counter() - start
+
+    frames = sum(s['frames'] for s in stats)
+    dropped = sum(s['dropped'] for s in stats)
+    report = {
+        'cameras': count,
+        'wall_time_s': wall_time,
+        'frames_processed': frames,
+        'frames_dropped': dropped,
+        'drop_rate': dropped / (frames + dropped) if frames + dropped else 0.0,
+        'aggregate_fps': frames / wall_time if wall_time > 0 else 0.0,
+        'per_camera': {f"sim{i}": s for i, s in enumerate(stats)}
+    }
+    if qos:
+        # Cameras leave the controller as they finish, so report the plan
+        # each one ended with rather than a snapshot of an empty controller
+        report['qos'] = {
+            'image_size': qos.image_size,
+            'predicted_latency': qos.predict_latency(qos.image_size),
+            'cameras': {f"sim{i}": s['qos'] for i, s in enumerate(stats) if 'qos' in s}
+        }
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='ParkVision load-testing harness')
+    parser.add_argument('--model', default=os.environ.get('MODEL_PATH') or 'models/best.pt',
+                        help='Local model file for in-process runs (never downloaded)')
+    parser.add_argument('--url', help='Test a running server instead of in-process apps')
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--detect-rate', type=float, default=5.0, help='/api/detect requests/s')
+    parser.add_argument('--upload-rate', type=float, default=1.0, help='/upload requests/s')
+    parser.add_argument('--stream-rate', type=float, default=0.2, help='new /video_feed clients/s')
+    parser.add_argument('--stream-seconds', type=float, default=5.0)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--frames', type=int, default=20, help='Distinct payload images')
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--fps', type=float, default=15.0, help='Simulated camera FPS')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cameras', type=int, default=4,
+                        help='Simulated cameras run through VideoProcessor (0 to skip)')
+    parser.add_argument('--camera-source', help="'sim:' source template for the cameras")
+    parser.add_argument('--qos', action='store_true', help='Enable the adaptive QoS controller')
+    parser.add_argument('--save-trace', help='Write the generated trace here')
+    parser.add_argument('--replay', help='Replay a saved trace instead of generating one')
+    parser.add_argument('--output', default='loadtest_results.json')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    in_process = not args.url
+    if in_process or args.cameras:
+        if not Path(args.model).is_file():
+            print(f"❌ Model not found: {args.model} (load tests only use local weights)")
+            return 2
+        # Read by Config and the apps at import time; never fall back to a
+        # downloaded model or random counts
+        os.environ['MODEL_PATH'] = str(args.model)
+        os.environ['MODEL_FALLBACK_PATH'] = ''
+        os.environ['FALLBACK_DETECTOR'] = 'False'
+    if in_process:
+        # The in-process stream app must never open a real camera
+        os.environ['CAMERA_SOURCE'] = f"sim:{args.width}x{args.height}@{args.fps:g}?seed={args.seed}"
+
+    if args.replay:
+        trace = load_trace(args.replay)
+    else:
+        trace = build_trace(args.duration, args.detect_rate, args.upload_rate, args.stream_rate,
+                            args.stream_seconds, args.frames, args.width, args.height, args.seed)
+    if args.save_trace:
+        save_trace(trace, args.save_trace)
+        print(f"💾 Trace saved to {args.save_trace} ({len(trace['events'])} requests)")
+
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'config': vars(args),
+        'trace': dict(trace['header'], requests=len(trace['events']))
+    }
+
+    # Memory of the process serving the requests: this one, or the server's
+    # own /metrics gauge in --url mode
+    read_rss = process_rss_bytes if in_process else lambda: scrape_rss(args.url)
+    with MemorySampler(read_rss) as memory:
+        if trace['events']:
+            if in_process:
+                import api
+                from src import app as stream_app
+                client = InProcessClient(api.app, stream_app.app)
+            else:
+                client = HttpClient(args.url)
+
+            print(f"🔄 Replaying {len(trace['events'])} requests...")
+            payloads = build_payloads(trace['header'])
+            report['requests'] = replay(client, trace, payloads, args.concurrency, args.fps)
+
+        if args.cameras:
+            print(f"🔄 Running {args.cameras} simulated cameras for {args.duration:g}s...")
+            source = args.camera_source or f"sim:{args.width}x{args.height}@{args.fps:g}?seed={{seed}}"
+            report['cameras'] = run_cameras(args.cameras, source, args.duration, args.qos)
+
+    report['memory'] = memory.report()
+    if report['memory']:
+        report['memory']['source'] = 'in_process' if in_process else 'server'
+    if in_process or args.cameras:
+        from src.metrics import FRAMES_DROPPED
+        report['frames_dropped_by_reason'] = {
+            f"{name}/{reason}": child.value
+            for (name, reason), child in FRAMES_DROPPED.children().items()
+        }
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for endpoint, stats in report.get('requests', {}).items():
+        if isinstance(stats, dict) and 'p50_ms' in stats and endpoint != 'schedule_lag':
+            line = (f"{endpoint:12s} {stats['count']:6d} req  p50={stats['p50_ms']:8.1f}ms  "
+                    f"p99={stats['p99_ms']:8.1f}ms  {stats['throughput_per_s']:6.1f}/s  "
+                    f"errors={stats['errors']}")
+            if endpoint == 'video_feed':
+                line += f"  frames={stats['frames_received']}/{stats['frames_expected']}"
+            print(line)
+    if 'cameras' in report:
+        cams = report['cameras']
+        print(f"cameras      {cams['cameras']:6d}      {cams['aggregate_fps']:6.1f} FPS total  "
+              f"dropped={cams['frames_dropped']} ({cams['drop_rate']:.1%})")
+    if report['memory']:
+        print(f"memory       {report['memory']['start_mb']:.0f}MB -> {report['memory']['end_mb']:.0f}MB "
+              f"(peak {report['memory']['peak_mb']:.0f}MB, {report['memory']['source']})")
+    elif not in_process:
+        print(f"memory       unavailable ({args.url}/metrics not reachable)")
+    print(f"✅ Results saved to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,15 +4,47 @@ Flask web application for ParkVision parking detection
 from flask import Flask, render_template, Response, jsonify
 import cv2
 import json
-from detector import ParkingDetector
+import os
+import threading
 from pathlib import Path
 
+try:
+    from src.detector import ParkingDetector
+    from src.metrics import (CONTENT_TYPE, FRAMES_DROPPED, FRAMES_PROCESSED, QUEUE_DEPTH,
+                             registry, stage_timer)
+    from src.qos import QoSController, REUSE, SKIP
+    from src.clip_recorder import ClipRecorder
+    from src.sim_camera import open_capture
+except ImportError:
+    from detector import ParkingDetector
+    from metrics import (CONTENT_TYPE, FRAMES_DROPPED, FRAMES_PROCESSED, QUEUE_DEPTH,
+                         registry, stage_timer)
+    from qos import QoSController, REUSE, SKIP
+    from clip_recorder import ClipRecorder
+    from sim_camera import open_capture
+
 app = Flask(__name__, 
             template_folder='../templates',
             static_folder='../static')
 
-# Initialize detector
-detector = ParkingDetector('models/best.pt')
+# Initialize detector (an empty MODEL_FALLBACK_PATH disables the fallback model)
+detector = ParkingDetector(os.environ.get('MODEL_PATH') or 'models/best.pt',
+                           fallback_path=os.environ.get('MODEL_FALLBACK_PATH', 'yolov8n.pt') or None)
+
+# Adaptive QoS controller (optional)
+qos = QoSController.from_env() if os.environ.get('QOS_ENABLED', 'False').lower() == 'true' else None
+# All viewers read the same camera, so they share one QoS registration
+stream_plan = None
+stream_viewers = 0
+stream_plan_lock = threading.Lock()
+
+# Event clips around occupancy changes (optional, enabled by CLIP_DIR).
+# Only the stream client holding recorder_owner feeds it, so frames from
+# several viewers are not duplicated or interleaved.
+clip_recorder = ClipRecorder.from_env('camera0')
+recorder_owner = threading.Lock()
+# Stream frames share the clip encoding so each frame is encoded once
+stream_encode_params = clip_recorder.encode_params if clip_recorder else []
 
 # Global variables for video stream
 camera = None
@@ -23,31 +55,95 @@ def get_camera():
     """Get or initialize camera"""
     global camera
     if camera is None or not camera.isOpened():
-        camera = cv2.VideoCapture(0)
+        camera = open_capture(os.environ.get('CAMERA_SOURCE') or '0')
     return camera
 
 
+def acquire_stream_plan():
+    """QoS plan for camera0, registered when the first viewer connects"""
+    global stream_plan, stream_viewers
+    with stream_plan_lock:
+        stream_viewers += 1
+        if stream_plan is None:
+            stream_plan = qos.camera('camera0', get_camera().get(cv2.CAP_PROP_FPS))
+        return stream_plan
+
+
+def release_stream_plan():
+    """Unregister camera0 from QoS when the last viewer disconnects"""
+    global stream_plan, stream_viewers
+    with stream_plan_lock:
+        stream_viewers -= 1
+        if stream_viewers == 0 and stream_plan is not None:
+            stream_plan.release()
+            stream_plan = None
+
+
 def generate_frames():
     """Generate video frames with detection"""
     global latest_counts
     
-    while True:
-        cam = get_camera()
-        success, frame = cam.read()
-        
-        if not success:
-            break
-        
-        # Process frame
-        annotated, counts = detector.process_frame(frame)
-        latest_counts = counts
-        
-        # Encode frame
-        ret, buffer = cv2.imencode('.jpg', annotated)
-        frame_bytes = buffer.tobytes()
-        
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+    clients = QUEUE_DEPTH.labels('video_feed_clients')
+    clients.inc()
+    plan = acquire_stream_plan() if qos else None
+    last = None
+    owns_recorder = False
+    try:
+        while True:
+            cam = get_camera()
+            action = plan.next_frame() if plan else None
+            if action == SKIP:
+                if not cam.grab():
+                    FRAMES_DROPPED.labels('stream', 'read_failed').inc()
+                    break
+                FRAMES_DROPPED.labels('stream', 'qos_skip').inc()
+                continue
+            
+            with stage_timer('stream', 'decode'):
+                success, frame = cam.read()
+            
+            if not success:
+                FRAMES_DROPPED.labels('stream', 'read_failed').inc()
+                break
+            
+            # Process frame, reusing the last detection when QoS says so
+            if action == REUSE and last is not None:
+                results, counts = last
+            else:
+                imgsz = plan.image_size if plan else None
+                results, seconds = detector.detect_timed(frame, imgsz)
+                if plan:
+                    plan.record(seconds, imgsz)
+                counts = detector.count_spaces(results)
+                last = (results, counts)
+            annotated = detector.annotate(frame, results, counts)
+            latest_counts = counts
+            
+            # Encode frame
+            with stage_timer('stream', 'encode'):
+                ret, buffer = cv2.imencode('.jpg', annotated, stream_encode_params)
+            if not ret:
+                FRAMES_DROPPED.labels('stream', 'encode_failed').inc()
+                continue
+            FRAMES_PROCESSED.labels('stream').inc()
+            
+            # Take over the recorder when no other client is feeding it
+            if clip_recorder and not owns_recorder:
+                owns_recorder = recorder_owner.acquire(blocking=False)
+            if owns_recorder:
+                with stage_timer('stream', 'clip_buffer'):
+                    clip_recorder.update(counts)
+                    clip_recorder.push_encoded(buffer)
+            frame_bytes = buffer.tobytes()
+            
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+    finally:
+        clients.dec()
+        if plan:
+            release_stream_plan()
+        if owns_recorder:
+            recorder_owner.release()
 
 
 @app.route('/')
@@ -69,6 +165,12 @@ def get_counts():
     return jsonify(latest_counts)
 
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics endpoint"""
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
 @app.route('/upload', methods=['POST'])
 def upload_video():
     """Upload and process video file"""
@@ -0,0 +1,379 @@
+"""
+Event clip recording for ParkVision
+
+Keeps a rolling window of recent JPEG-encoded frames per camera in a
+preallocated ring buffer. When occupancy changes, only the frames around the
+event are handed to a background thread that writes them to disk, instead of
+recording the whole stream.
+"""
+import json
+import math
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+try:
+    from src.metrics import FRAMES_DROPPED, QUEUE_DEPTH, registry
+    from src.log_utils import RateLimitedLogger
+except ImportError:
+    from metrics import FRAMES_DROPPED, QUEUE_DEPTH, registry
+    from log_utils import RateLimitedLogger
+
+
+log = RateLimitedLogger('parkvision.clips')
+
+CLIPS_WRITTEN = registry.counter(
+    'parkvision_clips_total', 'Event clips by outcome', ['outcome'])
+
+
+class FrameRingBuffer:
+    """
+    Fixed-size ring of encoded frames
+
+    Storage is one byte slab with a row per slot, plus arrays of sizes and
+    timestamps. Pushing a frame copies it into the next row and never
+    allocates. Without a fixed max_frame_bytes the slab is allocated on the
+    first push, with rows sized from that frame, so the slot size follows
+    the camera resolution and quality.
+    """
+
+    # Auto-sized rows hold frames up to this many times the first frame
+    SIZE_HEADROOM = 2
+    MIN_FRAME_BYTES = 64 * 1024
+
+    def __init__(self, capacity, max_frame_bytes=None):
+        """
+        Args:
+            capacity: Number of frames kept
+            max_frame_bytes: Largest encoded frame accepted (None to size
+                from the first frame)
+        """
+        self.capacity = capacity
+        self.max_frame_bytes = max_frame_bytes
+        self._data = None
+        if max_frame_bytes:
+            self._data = np.zeros((capacity, max_frame_bytes), dtype=np.uint8)
+        self._sizes = np.zeros(capacity, dtype=np.int64)
+        self._stamps = np.zeros(capacity, dtype=np.float64)
+        self._lock = threading.Lock()
+        # Sequence number of the next frame; slot = seq % capacity
+        self.next_seq = 0
+
+    def push(self, encoded, timestamp):
+        """
+        Copy an encoded frame into the ring
+
+        Args:
+            encoded: 1-D uint8 array (e.g. from cv2.imencode)
+            timestamp: Capture time in seconds
+
+        Returns:
+            int: Sequence number of the frame, or -1 if it was too large
+        """
+        size = encoded.size
+        with self._lock:
+            if self._data is None:
+                # Round up to 4 KiB rows
+                row = max(self.MIN_FRAME_BYTES, self.SIZE_HEADROOM * size)
+                self.max_frame_bytes = -(-row // 4096) * 4096
+                self._data = np.zeros((self.capacity, self.max_frame_bytes), dtype=np.uint8)
+            if size > self.max_frame_bytes:
+                return -1
+            seq = self.next_seq
+            slot = seq % self.capacity
+            self._data[slot, :size] = encoded.reshape(-1)
+            self._sizes[slot] = size
+            self._stamps[slot] = timestamp
+            self.next_seq = seq + 1
+        return seq
+
+    @property
+    def oldest_seq(self):
+        return max(0, self.next_seq - self.capacity)
+
+    def first_seq_since(self, timestamp):
+        """Oldest buffered sequence number captured at or after `timestamp`"""
+        with self._lock:
+            for seq in range(self.oldest_seq, self.next_seq):
+                if self._stamps[seq % self.capacity] >= timestamp:
+                    return seq
+            return self.next_seq
+
+    def copy_range(self, start_seq, end_seq):
+        """
+        Copy frames [start_seq, end_seq) out of the ring
+
+        Returns:
+            list: (timestamp, bytes) tuples for frames still buffered
+        """
+        with self._lock:
+            start_seq = max(start_seq, self.oldest_seq)
+            frames = []
+            for seq in range(start_seq, min(end_seq, self.next_seq)):
+                slot = seq % self.capacity
+                frames.append((float(self._stamps[slot]),
+                               self._data[slot, :self._sizes[slot]].tobytes()))
+            return frames
+
+
+class ClipWriter:
+    """Background thread that turns buffered JPEG frames into video files"""
+
+    def __init__(self, max_pending=8):
+        """
+        Args:
+            max_pending: Clips allowed to wait; further clips are dropped
+        """
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._depth = QUEUE_DEPTH.labels('clip_writer')
+        self._thread = threading.Thread(target=self._run, name='clip-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, path, frames, metadata):
+        """
+        Queue a clip for writing
+
+        Args:
+            path: Output video path (.mp4)
+            frames: List of (timestamp, jpeg_bytes)
+            metadata: Event details written next to the clip as JSON
+
+        Returns:
+            bool: False if the queue was full and the clip was dropped
+        """
+        self._depth.inc()
+        try:
+            self._queue.put_nowait((path, frames, metadata))
+        except queue.Full:
+            self._depth.dec()
+            CLIPS_WRITTEN.labels('dropped').inc()
+            log.warning('clip_dropped', path=str(path), reason='writer_queue_full')
+            return False
+        return True
+
+    def join(self):
+        """Block until every queued clip has been written"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            path, frames, metadata = self._queue.get()
+            try:
+                self._write(path, frames, metadata)
+                CLIPS_WRITTEN.labels('written').inc()
+            except Exception as e:
+                CLIPS_WRITTEN.labels('error').inc()
+                log.error('clip_write_failed', path=str(path), error=str(e))
+            finally:
+                self._depth.dec()
+                self._queue.task_done()
+
+    def _write(self, path, frames, metadata):
+        if not frames:
+            return
+        duration = frames[-1][0] - frames[0][0]
+        fps = (len(frames) - 1) / duration if duration > 0 else 1.0
+
+        writer = None
+        try:
+            for _, data in frames:
+                image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+                if image is None:
+                    continue
+                if writer is None:
+                    height, width = image.shape[:2]
+                    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                    writer = cv2.VideoWriter(str(path), fourcc, fps, (width, height))
+                writer.write(image)
+        finally:
+            if writer:
+                writer.release()
+
+        metadata = dict(metadata, frames=len(frames), fps=round(fps, 2))
+        with open(Path(path).with_suffix('.json'), 'w') as f:
+            json.dump(metadata, f, indent=2)
+        log.info('clip_written', path=str(path), frames=len(frames))
+
+
+_shared_writer = None
+_shared_writer_lock = threading.Lock()
+
+
+def get_clip_writer():
+    """Process-wide clip writer, started on first use"""
+    global _shared_writer
+    with _shared_writer_lock:
+        if _shared_writer is None:
+            _shared_writer = ClipWriter()
+        return _shared_writer
+
+
+class ClipRecorder:
+    """
+    Per-camera event recorder
+
+    Feed every processed frame with push() (or push_encoded() when the
+    caller already has the JPEG) and the latest counts with update(). An
+    occupancy change saves pre_seconds before and post_seconds after the
+    event; changes inside the post window extend the same clip. Use one
+    producer per camera so frames are not duplicated or interleaved.
+    """
+
+    def __init__(self, camera_id, out_dir, fps=30, pre_seconds=5.0, post_seconds=5.0,
+                 jpeg_quality=80, max_frame_bytes=None, writer=None):
+        """
+        Args:
+            camera_id: Camera name used in clip file names
+            out_dir: Directory for clips
+            fps: Expected frame rate, used to size the ring buffer
+            pre_seconds: Seconds kept before an event
+            post_seconds: Seconds kept after an event
+            jpeg_quality: JPEG quality for buffered frames
+            max_frame_bytes: Largest encoded frame kept; the ring holds
+                fps * (pre_seconds + post_seconds) slots of this size.
+                None sizes slots from the first frame (see FrameRingBuffer)
+            writer: ClipWriter (defaults to the shared one)
+        """
+        self.camera_id = str(camera_id)
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), int(jpeg_quality)]
+        self.writer = writer or get_clip_writer()
+
+        capacity = max(2, int(math.ceil((fps or 30) * (pre_seconds + post_seconds))) + 1)
+        self.buffer = FrameRingBuffer(capacity, max_frame_bytes)
+
+        self._last_counts = None
+        self._pending = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, camera_id, fps=None):
+        """
+        Build a recorder from the environment, or None if clips are disabled
+
+        Reads CLIP_DIR (empty disables recording), CLIP_PRE_SECONDS,
+        CLIP_POST_SECONDS, CLIP_JPEG_QUALITY and CLIP_MAX_FRAME_KB (ring slot
+        size per frame; empty sizes slots from the first frame). fps defaults
+        to CAMERA_FPS.
+        """
+        max_frame_kb = os.environ.get('CLIP_MAX_FRAME_KB')
+        clip_dir = os.environ.get('CLIP_DIR')
+        if not clip_dir:
+            return None
+        return cls(
+            camera_id, clip_dir,
+            fps=fps or int(os.environ.get('CAMERA_FPS') or 30),
+            pre_seconds=float(os.environ.get('CLIP_PRE_SECONDS') or 5.0),
+            post_seconds=float(os.environ.get('CLIP_POST_SECONDS') or 5.0),
+            jpeg_quality=int(os.environ.get('CLIP_JPEG_QUALITY') or 80),
+            max_frame_bytes=int(max_frame_kb) * 1024 if max_frame_kb else None)
+
+    def push(self, frame, timestamp=None):
+        """
+        Encode a frame into the ring buffer
+
+        Args:
+            frame: BGR image
+            timestamp: Capture time (defaults to now)
+        """
+        ok, encoded = cv2.imencode('.jpg', frame, self.encode_params)
+        if not ok:
+            FRAMES_DROPPED.labels('clip', 'encode_failed').inc()
+            return
+        self.push_encoded(encoded, timestamp)
+
+    def push_encoded(self, encoded, timestamp=None):
+        """
+        Add an already JPEG-encoded frame to the ring buffer
+
+        Args:
+            encoded: 1-D uint8 array from cv2.imencode
+            timestamp: Capture time (defaults to now)
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        if self.buffer.push(encoded, timestamp) < 0:
+            FRAMES_DROPPED.labels('clip', 'oversize').inc()
+            log.warning('clip_frame_oversize', camera=self.camera_id, bytes=int(encoded.size),
+                        limit=self.buffer.max_frame_bytes,
+                        hint='raise CLIP_MAX_FRAME_KB or lower CLIP_JPEG_QUALITY')
+
+        with self._lock:
+            pending = self._pending
+            if pending is None:
+                return
+            if timestamp >= pending['until']:
+                self._flush()
+            elif self.buffer.next_seq - pending['start_seq'] >= self.buffer.capacity:
+                # The window no longer fits in the ring; write what we have
+                # and record the rest of the post-event window as a new clip
+                self._flush()
+                self._pending = dict(pending, start_seq=self.buffer.next_seq,
+                                     events=list(pending['events']))
+
+    def update(self, counts, timestamp=None):
+        """
+        Report the latest counts; an occupancy change starts or extends a clip
+
+        Args:
+            counts: Dict from ParkingDetector.count_spaces
+            timestamp: Time of the counts (defaults to now)
+
+        Returns:
+            bool: True if this update was an occupancy change
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            previous, self._last_counts = self._last_counts, dict(counts)
+            if previous is None or previous.get('occupied') == counts.get('occupied'):
+                return False
+
+            event = {
+                'time': timestamp,
+                'from': previous.get('occupied'),
+                'to': counts.get('occupied'),
+                'counts': dict(counts)
+            }
+            if self._pending is None:
+                self._pending = {
+                    'start_seq': self.buffer.first_seq_since(timestamp - self.pre_seconds),
+                    'until': timestamp + self.post_seconds,
+                    'events': [event]
+                }
+            else:
+                self._pending['until'] = timestamp + self.post_seconds
+                self._pending['events'].append(event)
+            return True
+
+    def _flush(self):
+        # Caller holds self._lock
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        frames = self.buffer.copy_range(pending['start_seq'], self.buffer.next_seq)
+        if not frames:
+            return
+
+        first_event = pending['events'][0]['time']
+        stamp = datetime.fromtimestamp(first_event).strftime('%Y%m%d-%H%M%S-%f')
+        safe_id = ''.join(c if c.isalnum() or c in '-_' else '_' for c in self.camera_id)
+        path = self.out_dir / f"{safe_id}_{stamp}.mp4"
+        self.writer.submit(path, frames, {
+            'camera': self.camera_id,
+            'start': frames[0][0],
+            'end': frames[-1][0],
+            'events': pending['events']
+        })
+
+    def close(self):
+        """Write any clip still collecting post-event frames"""
+        with self._lock:
+            self._flush()
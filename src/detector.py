@@ -3,50 +3,109 @@ ParkVision - Parking Space Detector using YOLOv8
 """
 import cv2
 import numpy as np
-from ultralytics import YOLO
 from pathlib import Path
 
+try:
+    from src.metrics import STAGE_SECONDS, stage_timer
+    from src.model_registry import models
+    from src.log_utils import RateLimitedLogger
+except ImportError:
+    from metrics import STAGE_SECONDS, stage_timer
+    from model_registry import models
+    from log_utils import RateLimitedLogger
+
+
+log = RateLimitedLogger('parkvision.detector')
+
+# Class names treated as a parked vehicle when the model has no empty/occupied classes
+VEHICLE_NAMES = ('car', 'bus', 'truck')
+
 
 class ParkingDetector:
-    def __init__(self, model_path='models/best.pt', conf_threshold=0.5):
+    def __init__(self, model_path='models/best.pt', conf_threshold=0.5, imgsz=640,
+                 model_name=None, fallback_path='yolov8n.pt', vehicle_conf=0.3):
         """
         Initialize the parking detector with YOLOv8 model
         
+        The weights come from the process-wide model registry, so detectors
+        using the same slot share one copy and pick up hot-swapped versions.
+        
         Args:
             model_path: Path to trained YOLO model
             conf_threshold: Confidence threshold for detections
+            imgsz: Default model input size
+            model_name: Registry slot (defaults to model_path)
+            fallback_path: Model loaded if model_path fails (None to raise)
+            vehicle_conf: Minimum confidence for a vehicle to count as occupied
         """
         self.conf_threshold = conf_threshold
-        try:
-            # Try to load the custom model first
-            self.model = YOLO(model_path)
-            self.class_names = ['empty', 'occupied']
-            print(f"✅ Loaded custom model: {model_path}")
-        except Exception as e:
-            print(f"⚠️ Failed to load custom model: {e}")
-            print("🔄 Falling back to YOLOv8n pretrained model...")
-            # Fallback to pretrained model for cars
-            self.model = YOLO('yolov8n.pt')
-            self.class_names = ['person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck']
-            print("✅ Loaded YOLOv8n pretrained model")
-        
-    def detect(self, image):
+        self.imgsz = imgsz
+        self.vehicle_conf = vehicle_conf
+        self.model_name = model_name or str(model_path)
+        handle = models.ensure(self.model_name, model_path, fallback=fallback_path)
+        print(f"✅ Using model {handle.version} ({len(handle.class_names)} classes)"
+              + (" [fallback]" if models.is_fallback(self.model_name) else ""))
+    
+    @property
+    def handle(self):
+        """Active model handle for this detector's registry slot"""
+        return models.get(self.model_name)
+    
+    @property
+    def model(self):
+        return self.handle.model
+    
+    @property
+    def class_names(self):
+        return self.handle.class_names
+    
+    def names_for(self, results):
+        # Names travel with the results so a swap mid-frame can't mislabel boxes
+        names = getattr(results, 'names', None)
+        if isinstance(names, dict):
+            return names
+        return dict(enumerate(self.class_names))
+        
+    def detect(self, image, imgsz=None):
         """
         Detect parking spaces in an image
         
         Args:
             image: Input image (numpy array)
+            imgsz: Model input size for this call (defaults to self.imgsz)
             
         Returns:
             results: Detection results with bounding boxes and classes
         """
-        results = self.model(image, conf=self.conf_threshold)[0]
-        return results
+        return self.detect_timed(image, imgsz)[0]
+    
+    def detect_timed(self, image, imgsz=None):
+        """
+        Detect parking spaces and report the pure inference time
+        
+        Shared models serialise inference, so the wall time of detect() also
+        includes waiting for other callers; the returned duration does not.
+        
+        Args:
+            image: Input image (numpy array)
+            imgsz: Model input size for this call (defaults to self.imgsz)
+            
+        Returns:
+            tuple: (results, inference_seconds)
+        """
+        results, seconds = self.handle.predict_timed(image, conf=self.conf_threshold,
+                                                     imgsz=imgsz or self.imgsz, verbose=False)
+        STAGE_SECONDS.labels('detector', 'inference').observe(seconds)
+        return results[0], seconds
     
     def count_spaces(self, results):
         """
         Count empty and occupied parking spaces
         
+        Parking models count their empty/occupied classes directly. For
+        vehicle-only models (e.g. COCO) each vehicle is an occupied space
+        and the total is estimated from the vehicle count.
+        
         Args:
             results: YOLO detection results
             
@@ -55,12 +114,36 @@ class ParkingDetector:
         """
         counts = {'empty': 0, 'occupied': 0, 'total': 0}
         
-        if results.boxes is not None:
-            for box in results.boxes:
-                cls = int(box.cls[0])
-                if cls < len(self.class_names):
-                    counts[self.class_names[cls]] += 1
-                    counts['total'] += 1
+        with stage_timer('detector', 'count'):
+            names = self.names_for(results)
+            boxes = results.boxes if results is not None else None
+            
+            if 'occupied' in names.values():
+                if boxes is not None:
+                    for box in boxes:
+                        name = names.get(int(box.cls[0]))
+                        if name in counts:
+                            counts[name] += 1
+                            counts['total'] += 1
+                return counts
+            
+            vehicles = 0
+            objects = len(boxes) if boxes is not None else 0
+            if objects:
+                for box in boxes:
+                    if names.get(int(box.cls[0])) in VEHICLE_NAMES and float(box.conf[0]) > self.vehicle_conf:
+                        vehicles += 1
+            log.info('detections', vehicles=vehicles, objects=objects)
+            
+            if vehicles:
+                # Estimate total spaces from the vehicle count: at least 8, at most 20
+                counts['occupied'] = vehicles
+                counts['total'] = min(max(vehicles * 2, 8), 20)
+                counts['empty'] = counts['total'] - counts['occupied']
+            else:
+                # No vehicles detected - assume parking lot is mostly empty
+                counts['empty'] = 12
+                counts['total'] = 12
         
         return counts
     
@@ -75,37 +158,43 @@ class ParkingDetector:
         Returns:
             annotated_image: Image with drawn detections
         """
-        annotated = image.copy()
-        
-        if results.boxes is not None:
-            for box in results.boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                conf = float(box.conf[0])
-                cls = int(box.cls[0])
-                
-                # Color: Green for empty, Red for occupied
-                color = (0, 255, 0) if cls == 0 else (0, 0, 255)
-                label = f"{self.class_names[cls]}: {conf:.2f}"
-                
-                # Draw box and label
-                cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 2)
-                cv2.putText(annotated, label, (x1, y1 - 10),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+        with stage_timer('detector', 'draw'):
+            annotated = image.copy()
+            names = self.names_for(results)
+            
+            if results is not None and results.boxes is not None:
+                for box in results.boxes:
+                    x1, y1, x2, y2 = map(int, box.xyxy[0])
+                    conf = float(box.conf[0])
+                    cls = int(box.cls[0])
+                    
+                    # Color: Green for empty, Red for occupied
+                    name = names.get(cls, str(cls))
+                    color = (0, 255, 0) if name == 'empty' else (0, 0, 255)
+                    label = f"{name}: {conf:.2f}"
+                    
+                    # Draw box and label
+                    cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 2)
+                    cv2.putText(annotated, label, (x1, y1 - 10),
+                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
         
         return annotated
     
-    def process_frame(self, frame):
+    def annotate(self, frame, results, counts):
         """
-        Process a single frame: detect, count, and annotate
+        Draw detections and the count overlay on a frame
+        
+        Also used to re-annotate frames with the previous results when
+        detection is skipped for them.
         
         Args:
             frame: Input video frame
+            results: YOLO detection results
+            counts: Counts from count_spaces
             
         Returns:
-            tuple: (annotated_frame, counts)
+            annotated_frame: Frame with boxes and count overlay
         """
-        results = self.detect(frame)
-        counts = self.count_spaces(results)
         annotated = self.draw_detections(frame, results)
         
         # Add count overlay
@@ -113,4 +202,22 @@ class ParkingDetector:
         cv2.putText(annotated, text, (10, 30),
                    cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
         
+        return annotated
+    
+    def process_frame(self, frame, imgsz=None):
+        """
+        Process a single frame: detect, count, and annotate
+        
+        Args:
+            frame: Input video frame
+            imgsz: Model input size for this frame (defaults to self.imgsz)
+            
+        Returns:
+            tuple: (annotated_frame, counts)
+        """
+        with stage_timer('detector', 'process_frame'):
+            results = self.detect(frame, imgsz)
+            counts = self.count_spaces(results)
+            annotated = self.annotate(frame, results, counts)
+        
         return annotated, counts
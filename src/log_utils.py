@@ -0,0 +1,94 @@
+"""
+Structured, rate-limited logging for ParkVision hot paths
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+
+def get_logger(name='parkvision'):
+    """
+    Get a logger that writes one JSON object per line
+
+    Args:
+        name: Logger name
+
+    Returns:
+        logging.Logger
+    """
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(os.environ.get('LOG_LEVEL') or 'INFO')
+        logger.propagate = False
+    return logger
+
+
+class RateLimitedLogger:
+    """
+    Emit each event at most once per interval
+
+    Calls inside the interval only bump a counter, so per-frame or
+    per-request events cost almost nothing. The next emitted record
+    carries the number of suppressed occurrences.
+    """
+
+    def __init__(self, name='parkvision', interval=5.0):
+        """
+        Args:
+            name: Underlying logger name
+            interval: Minimum seconds between records for the same event
+        """
+        self.logger = get_logger(name)
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._last = {}
+        self._suppressed = {}
+
+    def log(self, level, event, interval=None, **fields):
+        """
+        Log a structured event if its rate limit allows
+
+        Args:
+            level: logging level
+            event: Event name, also the rate-limit key
+            interval: Override the default interval for this event
+            **fields: Extra key/value pairs for the record
+
+        Returns:
+            bool: True if the record was emitted
+        """
+        if not self.logger.isEnabledFor(level):
+            return False
+
+        now = time.monotonic()
+        limit = self.interval if interval is None else interval
+        with self._lock:
+            if now - self._last.get(event, float('-inf')) < limit:
+                self._suppressed[event] = self._suppressed.get(event, 0) + 1
+                return False
+            self._last[event] = now
+            suppressed = self._suppressed.pop(event, 0)
+
+        record = {'ts': round(time.time(), 3), 'level': logging.getLevelName(level), 'event': event}
+        record.update(fields)
+        if suppressed:
+            record['suppressed'] = suppressed
+        self.logger.log(level, json.dumps(record, default=str))
+        return True
+
+    def debug(self, event, **fields):
+        return self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event, **fields):
+        return self.log(logging.INFO, event, **fields)
+
+    def warning(self, event, **fields):
+        return self.log(logging.WARNING, event, **fields)
+
+    def error(self, event, **fields):
+        return self.log(logging.ERROR, event, **fields)
@@ -0,0 +1,253 @@
+"""
+Process-wide model registry for ParkVision
+
+Each model artifact is loaded exactly once and shared by every detector in
+the process. Detectors refer to a named slot rather than holding the model,
+so a new version can be swapped in atomically without a restart.
+"""
+import threading
+import time
+from pathlib import Path
+
+try:
+    from src.metrics import QUEUE_DEPTH, registry as metrics_registry, record_cache, stage_timer
+    from src.log_utils import RateLimitedLogger
+except ImportError:
+    from metrics import QUEUE_DEPTH, registry as metrics_registry, record_cache, stage_timer
+    from log_utils import RateLimitedLogger
+
+
+log = RateLimitedLogger('parkvision.models', interval=0)
+
+MODEL_LOADS = metrics_registry.counter(
+    'parkvision_model_loads_total', 'Model artifact loads by outcome', ['outcome'])
+MODEL_SWAPS = metrics_registry.counter(
+    'parkvision_model_swaps_total', 'Model slot swaps', ['slot'])
+
+
+def _default_loader(path):
+    from ultralytics import YOLO
+    return YOLO(path)
+
+
+def _class_names(model):
+    """Class names from model metadata as a list indexed by class id"""
+    names = getattr(model, 'names', None) or {}
+    if isinstance(names, dict):
+        if not names:
+            return []
+        ordered = [str(i) for i in range(max(names) + 1)]
+        for idx, name in names.items():
+            ordered[int(idx)] = name
+        return ordered
+    return list(names)
+
+
+class ModelHandle:
+    """A loaded model artifact plus its metadata"""
+
+    def __init__(self, path, model, version=None):
+        self.path = str(path)
+        self.model = model
+        self.version = version or Path(self.path).stem
+        self.class_names = _class_names(model)
+        self.loaded_at = time.time()
+        # Ultralytics predictors keep per-call state, so serialise inference
+        self._lock = threading.Lock()
+
+    def predict(self, image, **kwargs):
+        """Run the model on an image (thread-safe)"""
+        return self.predict_timed(image, **kwargs)[0]
+
+    def predict_timed(self, image, **kwargs):
+        """
+        Run the model on an image and time only the model call
+
+        Time spent waiting for the lock goes to the 'model'/'queue' stage and
+        the inference queue depth, not into the returned duration.
+
+        Returns:
+            tuple: (results, inference_seconds)
+        """
+        depth = QUEUE_DEPTH.labels('inference')
+        depth.inc()
+        try:
+            with stage_timer('model', 'queue'):
+                self._lock.acquire()
+        finally:
+            depth.dec()
+        try:
+            start = time.perf_counter()
+            results = self.model(image, **kwargs)
+            return results, time.perf_counter() - start
+        finally:
+            self._lock.release()
+
+    def info(self):
+        return {
+            'path': self.path,
+            'version': self.version,
+            'classes': self.class_names,
+            'loaded_at': self.loaded_at
+        }
+
+
+class ModelRegistry:
+    """Loads artifacts once and maps slot names to the active handle"""
+
+    def __init__(self, loader=_default_loader):
+        """
+        Args:
+            loader: Callable that loads a model from a path
+        """
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._artifacts = {}
+        self._load_locks = {}
+        self._slots = {}
+        self._fallback_slots = set()
+
+    def _key(self, path):
+        # Include the mtime so a file overwritten in place counts as a new artifact
+        path = Path(path)
+        if not path.exists():
+            return str(path)
+        return f"{path.resolve()}@{path.stat().st_mtime_ns}"
+
+    def load(self, path, version=None):
+        """
+        Load an artifact, or return the already loaded copy
+
+        Args:
+            path: Model file path (or a name ultralytics can resolve)
+            version: Version label (defaults to the file stem)
+
+        Returns:
+            ModelHandle
+        """
+        key = self._key(path)
+        with self._lock:
+            handle = self._artifacts.get(key)
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        if handle is not None:
+            record_cache('model', True)
+            return handle
+
+        # Per-artifact lock so concurrent callers wait for one load
+        with load_lock:
+            with self._lock:
+                handle = self._artifacts.get(key)
+            if handle is not None:
+                record_cache('model', True)
+                return handle
+
+            record_cache('model', False)
+            try:
+                model = self.loader(str(path))
+            except Exception:
+                MODEL_LOADS.labels('error').inc()
+                raise
+            handle = ModelHandle(path, model, version)
+            MODEL_LOADS.labels('ok').inc()
+            log.info('model_loaded', path=str(path), version=handle.version,
+                     classes=len(handle.class_names))
+
+            # A name the loader downloads only has its file key afterwards;
+            # keep both so later loads of either form share this copy
+            with self._lock:
+                self._artifacts[key] = handle
+                self._artifacts[self._key(path)] = handle
+            return handle
+
+    def ensure(self, name, path, fallback=None):
+        """
+        Return the handle in a slot, loading `path` into it if empty
+
+        Args:
+            name: Slot name
+            path: Model file to load when the slot is empty
+            fallback: Model to use if `path` fails to load (logged as a warning)
+
+        Returns:
+            ModelHandle
+        """
+        with self._lock:
+            handle = self._slots.get(name)
+        if handle is not None:
+            record_cache('model', True)
+            return handle
+
+        is_fallback = False
+        try:
+            handle = self.load(path)
+        except Exception as e:
+            if not fallback:
+                raise
+            log.warning('model_fallback', slot=name, path=str(path), fallback=str(fallback),
+                        error=str(e))
+            handle = self.load(fallback)
+            is_fallback = True
+
+        with self._lock:
+            # Another thread may have filled the slot meanwhile
+            if name not in self._slots:
+                self._slots[name] = handle
+                if is_fallback:
+                    self._fallback_slots.add(name)
+            return self._slots[name]
+
+    def swap(self, name, path, version=None):
+        """
+        Atomically point a slot at a new model version
+
+        The new artifact is fully loaded before the swap; on failure the
+        current model stays active. In-flight calls finish on the old model.
+
+        Args:
+            name: Slot name
+            path: New model file
+            version: Version label
+
+        Returns:
+            ModelHandle: The newly active handle
+        """
+        handle = self.load(path, version)
+        with self._lock:
+            previous = self._slots.get(name)
+            self._slots[name] = handle
+            self._fallback_slots.discard(name)
+            self._prune()
+        MODEL_SWAPS.labels(name).inc()
+        log.info('model_swapped', slot=name, version=handle.version,
+                 previous=previous.version if previous else None)
+        return handle
+
+    def get(self, name):
+        """
+        Active handle for a slot
+
+        Raises:
+            KeyError: If nothing has been loaded into the slot
+        """
+        return self._slots[name]
+
+    def is_fallback(self, name):
+        """True if the slot is serving its fallback model"""
+        return name in self._fallback_slots
+
+    def _prune(self):
+        # Caller holds self._lock; drop artifacts no slot refers to any more.
+        # Load locks are kept: a concurrent load() may be holding one
+        active = {id(handle) for handle in self._slots.values()}
+        for key in [k for k, h in self._artifacts.items() if id(h) not in active]:
+            del self._artifacts[key]
+
+    def slots(self):
+        """Info for every slot"""
+        with self._lock:
+            return {name: dict(handle.info(), fallback=name in self._fallback_slots)
+                    for name, handle in self._slots.items()}
+
+
+# Shared by every detector in the process
+models = ModelRegistry()
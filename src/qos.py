@@ -0,0 +1,277 @@
+"""
+Adaptive quality-of-service controller for ParkVision
+
+Watches measured inference latency and CPU headroom and adjusts the model
+input size, per-camera sampling rate and detection interval so each camera
+gets a fresh count within a target latency. As cameras are added the node
+lowers resolution and detection frequency instead of building a backlog.
+"""
+import math
+import os
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    from src.metrics import registry
+except ImportError:
+    from metrics import registry
+
+
+# Frame actions returned by CameraQoS.next_frame
+SKIP = 'skip'        # don't decode/process this frame
+REUSE = 'reuse'      # annotate with the previous detection results
+DETECT = 'detect'    # run inference on this frame
+
+# Model input sizes must be multiples of the YOLO stride
+SIZE_STEP = 32
+REFERENCE_SIZE = 640
+
+IMAGE_SIZE_GAUGE = registry.gauge(
+    'parkvision_qos_image_size', 'Model input size chosen by the QoS controller')
+SAMPLE_FPS_GAUGE = registry.gauge(
+    'parkvision_qos_sample_fps', 'Frames sampled per second per camera', ['camera'])
+DETECT_INTERVAL_GAUGE = registry.gauge(
+    'parkvision_qos_detect_interval', 'Sampled frames per detection per camera', ['camera'])
+UPDATE_LATENCY_GAUGE = registry.gauge(
+    'parkvision_qos_expected_update_seconds', 'Expected time between fresh counts per camera',
+    ['camera'])
+
+
+def cpu_headroom():
+    """
+    Fraction of CPU capacity currently idle (0.0 - 1.0)
+
+    Uses psutil when installed, otherwise the 1-minute load average.
+    """
+    if psutil is not None:
+        return max(0.0, 1.0 - psutil.cpu_percent(interval=None) / 100.0)
+    try:
+        load = os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return 1.0
+    return min(1.0, max(0.0, 1.0 - load))
+
+
+class CameraQoS:
+    """Per-camera sampling state handed out by QoSController.camera()"""
+
+    def __init__(self, controller, camera_id, source_fps):
+        self.controller = controller
+        self.camera_id = str(camera_id)
+        self.source_fps = float(source_fps) if source_fps and source_fps > 0 else 30.0
+        self.sample_fps = self.source_fps
+        self.detect_interval = 1
+        self._frame_index = 0
+        self._sample_index = 0
+
+    @property
+    def stride(self):
+        """Source frames per sampled frame"""
+        return max(1, int(round(self.source_fps / self.sample_fps)))
+
+    def next_frame(self):
+        """
+        Decide what to do with the next source frame
+
+        Returns:
+            str: SKIP, REUSE or DETECT
+        """
+        self.controller.maybe_adjust()
+
+        index = self._frame_index
+        self._frame_index += 1
+        if index % self.stride:
+            return SKIP
+
+        sample = self._sample_index
+        self._sample_index += 1
+        return REUSE if sample % self.detect_interval else DETECT
+
+    @property
+    def image_size(self):
+        return self.controller.image_size
+
+    def record(self, latency, image_size=None):
+        """Report how long a detection took (seconds)"""
+        self.controller.record(latency, image_size)
+
+    def release(self):
+        """Stop counting this camera towards the node load"""
+        self.controller.release(self.camera_id)
+
+
+class QoSController:
+    """
+    Node-wide controller shared by every camera
+
+    Inference cost is modelled as proportional to input pixels and learned
+    from measured latencies with an exponentially weighted moving average.
+    """
+
+    def __init__(self, target_latency=1.0, min_image_size=320, max_image_size=640,
+                 utilization=0.8, min_headroom=0.1, min_sample_fps=5.0,
+                 adjust_interval=2.0, smoothing=0.2):
+        """
+        Args:
+            target_latency: Target seconds between fresh counts per camera
+            min_image_size: Smallest model input size the controller may use
+            max_image_size: Largest model input size (starting point)
+            utilization: Fraction of inference capacity the controller plans to use
+            min_headroom: Idle CPU fraction below which the node counts as overloaded
+            min_sample_fps: Frames per second kept for display when CPU allows
+            adjust_interval: Seconds between adjustments
+            smoothing: EWMA weight for new latency samples
+        """
+        self.target_latency = target_latency
+        self.min_image_size = self._round_size(min_image_size)
+        self.max_image_size = max(self._round_size(max_image_size), self.min_image_size)
+        self.utilization = utilization
+        self.min_headroom = min_headroom
+        self.min_sample_fps = min_sample_fps
+        self.adjust_interval = adjust_interval
+        self.smoothing = smoothing
+
+        self.image_size = self.max_image_size
+        self._unit_cost = None
+        self._cameras = {}
+        self._lock = threading.Lock()
+        self._last_adjust = time.monotonic()
+        IMAGE_SIZE_GAUGE.set(self.image_size)
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a controller from the environment
+
+        Reads QOS_TARGET_LATENCY (seconds per camera update), QOS_MIN_IMAGE_SIZE
+        and IMAGE_SIZE (the largest input size used).
+        """
+        return cls(
+            target_latency=float(os.environ.get('QOS_TARGET_LATENCY') or 1.0),
+            min_image_size=int(os.environ.get('QOS_MIN_IMAGE_SIZE') or 320),
+            max_image_size=int(os.environ.get('IMAGE_SIZE') or 640))
+
+    @staticmethod
+    def _round_size(size):
+        return max(SIZE_STEP, int(size) // SIZE_STEP * SIZE_STEP)
+
+    def camera(self, camera_id, source_fps=None):
+        """
+        Register a camera (or return the existing registration)
+
+        Args:
+            camera_id: Unique camera name
+            source_fps: Native frame rate of the source
+
+        Returns:
+            CameraQoS
+        """
+        with self._lock:
+            cam = self._cameras.get(str(camera_id))
+            if cam is None:
+                cam = CameraQoS(self, camera_id, source_fps)
+                self._cameras[cam.camera_id] = cam
+                self._apply(cpu_headroom())
+            return cam
+
+    def release(self, camera_id):
+        with self._lock:
+            if self._cameras.pop(str(camera_id), None) is not None:
+                self._apply(cpu_headroom())
+
+    def record(self, latency, image_size=None):
+        """
+        Feed a measured inference latency into the cost model
+
+        Args:
+            latency: Seconds spent in inference
+            image_size: Input size used (defaults to the current size)
+        """
+        size = image_size or self.image_size
+        unit = latency * (REFERENCE_SIZE / size) ** 2
+        with self._lock:
+            if self._unit_cost is None:
+                self._unit_cost = unit
+            else:
+                self._unit_cost += self.smoothing * (unit - self._unit_cost)
+
+    def predict_latency(self, image_size):
+        """Predicted inference seconds at a given input size (None if unknown)"""
+        if self._unit_cost is None:
+            return None
+        return self._unit_cost * (image_size / REFERENCE_SIZE) ** 2
+
+    def maybe_adjust(self):
+        """Re-plan if the adjust interval has elapsed"""
+        now = time.monotonic()
+        if now - self._last_adjust < self.adjust_interval:
+            return
+        with self._lock:
+            if now - self._last_adjust < self.adjust_interval:
+                return
+            self._last_adjust = now
+            self._apply(cpu_headroom())
+
+    def _load(self, image_size, n_cameras):
+        """Fraction of one inference worker needed to hit the target at this size"""
+        latency = self.predict_latency(image_size)
+        period = max(self.target_latency - latency, latency)
+        return n_cameras * latency / period
+
+    def _apply(self, headroom):
+        # Caller holds self._lock
+        if self._unit_cost is None or not self._cameras:
+            return
+
+        n = len(self._cameras)
+        overloaded = headroom < self.min_headroom
+
+        # Largest size that fits the budget; step down at once, up one notch at a time
+        fitting = self.min_image_size
+        for size in range(self.max_image_size, self.min_image_size - 1, -SIZE_STEP):
+            if self._load(size, n) <= self.utilization:
+                fitting = size
+                break
+        if overloaded or fitting < self.image_size:
+            self.image_size = max(self.min_image_size,
+                                  min(fitting, self.image_size - (SIZE_STEP if overloaded else 0)))
+        elif fitting > self.image_size and headroom >= 2 * self.min_headroom:
+            self.image_size += SIZE_STEP
+        IMAGE_SIZE_GAUGE.set(self.image_size)
+
+        latency = self.predict_latency(self.image_size)
+        capacity = self.utilization / (n * latency) if latency > 0 else float('inf')
+        needed = 1.0 / max(self.target_latency - latency, latency) if latency > 0 else float('inf')
+
+        for cam in self._cameras.values():
+            detect_fps = max(min(cam.source_fps, needed, capacity), 1e-3)
+            if headroom < 2 * self.min_headroom:
+                sample_fps = detect_fps
+            else:
+                sample_fps = min(cam.source_fps, max(detect_fps, self.min_sample_fps))
+            cam.sample_fps = sample_fps
+            cam.detect_interval = max(1, int(math.floor(sample_fps / detect_fps)))
+
+            SAMPLE_FPS_GAUGE.labels(cam.camera_id).set(sample_fps)
+            DETECT_INTERVAL_GAUGE.labels(cam.camera_id).set(cam.detect_interval)
+            UPDATE_LATENCY_GAUGE.labels(cam.camera_id).set(
+                cam.detect_interval / sample_fps + latency)
+
+    def snapshot(self):
+        """Current settings, for health checks and logging"""
+        with self._lock:
+            return {
+                'image_size': self.image_size,
+                'predicted_latency': self.predict_latency(self.image_size),
+                'cameras': {
+                    cam.camera_id: {
+                        'sample_fps': cam.sample_fps,
+                        'detect_interval': cam.detect_interval
+                    } for cam in self._cameras.values()
+                }
+            }
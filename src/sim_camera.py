@@ -0,0 +1,255 @@
+"""
+Simulated camera source for ParkVision
+
+A stand-in for cv2.VideoCapture that serves synthetic or file-backed frames
+at a configurable resolution and frame rate, so the streaming app, video
+pipeline and load tests can run without real cameras.
+
+Sources:
+    sim:640x480@15                  synthetic frames, 640x480 at 15 FPS
+    sim:data/sample.mp4?fps=10      frames from a local video, looped at 10 FPS
+    sim:1280x720@25?duration=60     stop after 60 seconds of video
+"""
+import re
+import threading
+import time
+from urllib.parse import parse_qs
+
+import cv2
+import numpy as np
+
+try:
+    from src.metrics import FRAMES_DROPPED
+except ImportError:
+    from metrics import FRAMES_DROPPED
+
+
+SIZE_SPEC = re.compile(r'^(\d+)x(\d+)(?:@(\d+(?:\.\d+)?))?$')
+
+
+def make_synthetic_frames(count, width=640, height=480, seed=0):
+    """
+    Build deterministic parking-lot-like frames
+
+    Args:
+        count: Number of frames
+        width: Frame width
+        height: Frame height
+        seed: Random seed so runs are comparable
+
+    Returns:
+        list: BGR frames (numpy arrays)
+    """
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(count):
+        # Asphalt background with painted bay lines
+        frame = np.full((height, width, 3), 90, dtype=np.uint8)
+        for x in range(0, width, 80):
+            cv2.line(frame, (x, 0), (x, height), (230, 230, 230), 2)
+
+        # Car-sized blocks in random bays
+        for _ in range(int(rng.integers(4, 12))):
+            x = int(rng.integers(0, max(width - 70, 1)))
+            y = int(rng.integers(0, max(height - 120, 1)))
+            color = tuple(int(c) for c in rng.integers(0, 255, 3))
+            cv2.rectangle(frame, (x, y), (x + 60, y + 110), color, -1)
+        frames.append(frame)
+    return frames
+
+
+def load_video_frames(video_path, count, width=None, height=None):
+    """
+    Read up to `count` frames from a local video file
+
+    Args:
+        video_path: Path to a local video
+        count: Maximum number of frames to read
+        width: Resize to this width (optional, needs height)
+        height: Resize to this height (optional, needs width)
+
+    Returns:
+        list: BGR frames
+    """
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {video_path}")
+
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if width and height:
+            frame = cv2.resize(frame, (width, height))
+        frames.append(frame)
+    cap.release()
+
+    if not frames:
+        raise ValueError(f"No frames read from video: {video_path}")
+    return frames
+
+
+class SimulatedCamera:
+    """
+    cv2.VideoCapture-compatible camera backed by a pool of frames
+
+    In real-time mode frames become available at `fps` like a live camera:
+    read() waits for the next frame, and frames that elapsed while the
+    caller was busy are skipped and counted in dropped_frames.
+    """
+
+    def __init__(self, frames=None, fps=15.0, width=None, height=None, realtime=True,
+                 duration=None, pool_size=60, seed=0, video_path=None):
+        """
+        Args:
+            frames: Frames to serve (looped); generated when omitted
+            fps: Frame rate
+            width: Frame width; synthetic frames default to 640, video
+                frames keep their size unless width and height are given
+            height: Frame height; synthetic frames default to 480
+            realtime: Pace frames by wall clock; False serves them as fast as read
+            duration: Seconds of video before read() returns False (None = forever)
+            pool_size: Distinct frames to generate or load
+            seed: Seed for synthetic frames
+            video_path: Load frames from this local video instead
+        """
+        if frames is None:
+            if video_path:
+                frames = load_video_frames(video_path, pool_size, width, height)
+            else:
+                frames = make_synthetic_frames(pool_size, width or 640, height or 480, seed)
+        self.frames = frames
+        self.fps = float(fps)
+        self.height, self.width = frames[0].shape[:2]
+        self.realtime = realtime
+        self.total_frames = int(duration * self.fps) if duration else None
+
+        self.dropped_frames = 0
+        self.delivered_frames = 0
+        self._next_index = 0
+        self._grabbed = None
+        self._start = None
+        self._opened = True
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_source(cls, source):
+        """
+        Build a camera from a 'sim:' source string
+
+        Args:
+            source: e.g. 'sim:640x480@15' or 'sim:data/sample.mp4?fps=10'
+
+        Returns:
+            SimulatedCamera
+        """
+        spec = source[len('sim:'):] if source.startswith('sim:') else source
+        if spec.startswith('//'):
+            # Accept 'sim://...' without eating the slash of absolute paths
+            spec = spec[2:]
+        spec, _, query = spec.partition('?')
+        params = {k: v[-1] for k, v in parse_qs(query).items()}
+
+        kwargs = {
+            'fps': float(params.get('fps', 15)),
+            'realtime': params.get('realtime', 'true').lower() == 'true',
+            'duration': float(params['duration']) if 'duration' in params else None,
+            'pool_size': int(params.get('frames', 60)),
+            'seed': int(params.get('seed', 0))
+        }
+        if 'width' in params and 'height' in params:
+            kwargs['width'], kwargs['height'] = int(params['width']), int(params['height'])
+
+        match = SIZE_SPEC.match(spec)
+        if match:
+            kwargs['width'], kwargs['height'] = int(match.group(1)), int(match.group(2))
+            if match.group(3):
+                kwargs['fps'] = float(match.group(3))
+        elif spec:
+            kwargs['video_path'] = spec
+        return cls(**kwargs)
+
+    def isOpened(self):
+        return self._opened
+
+    def grab(self):
+        """Advance to the next available frame without returning it"""
+        with self._lock:
+            if not self._opened:
+                return False
+            if self._start is None:
+                self._start = time.perf_counter()
+
+            index = self._next_index
+            if self.realtime:
+                due = self._start + index / self.fps
+                now = time.perf_counter()
+                if now < due:
+                    time.sleep(due - now)
+                else:
+                    # Frames produced while the caller was busy are gone
+                    latest = int((now - self._start) * self.fps)
+                    if latest > index:
+                        self.dropped_frames += latest - index
+                        FRAMES_DROPPED.labels('sim_camera', 'consumer_slow').inc(latest - index)
+                        index = latest
+
+            if self.total_frames is not None and index >= self.total_frames:
+                self._opened = False
+                return False
+
+            self._grabbed = index
+            self._next_index = index + 1
+            self.delivered_frames += 1
+            return True
+
+    def retrieve(self, image=None, flag=None):
+        if self._grabbed is None:
+            return False, None
+        return True, self.frames[self._grabbed % len(self.frames)].copy()
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self._next_index)
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return 1000.0 * max(self._next_index - 1, 0) / self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.total_frames or 0)
+        return 0.0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self._opened = False
+
+
+def open_capture(source):
+    """
+    Open a camera source
+
+    Args:
+        source: 'sim:...' for a SimulatedCamera, a device index (int or
+            digit string), or anything cv2.VideoCapture accepts
+
+    Returns:
+        SimulatedCamera or cv2.VideoCapture
+    """
+    if isinstance(source, str):
+        if source.startswith('sim:'):
+            return SimulatedCamera.from_source(source)
+        if source.isdigit():
+            source = int(source)
+    return cv2.VideoCapture(source)
@@ -4,29 +4,90 @@ Video processing pipeline for real-time parking detection
 import cv2
 import time
 from pathlib import Path
-from detector import ParkingDetector
+
+try:
+    from src.detector import ParkingDetector
+    from src.metrics import FRAMES_DROPPED, FRAMES_PROCESSED, stage_timer
+    from src.log_utils import RateLimitedLogger
+    from src.qos import DETECT, REUSE, SKIP
+    from src.clip_recorder import ClipRecorder
+    from src.sim_camera import open_capture
+except ImportError:
+    from detector import ParkingDetector
+    from metrics import FRAMES_DROPPED, FRAMES_PROCESSED, stage_timer
+    from log_utils import RateLimitedLogger
+    from qos import DETECT, REUSE, SKIP
+    from clip_recorder import ClipRecorder
+    from sim_camera import open_capture
+
+
+log = RateLimitedLogger('parkvision.video')
 
 
 class VideoProcessor:
-    def __init__(self, model_path='models/best.pt'):
+    def __init__(self, model_path='models/best.pt', qos=None, detector=None):
         """
         Initialize video processor with parking detector
         
         Args:
             model_path: Path to trained YOLO model
+            qos: Optional QoSController that picks the input size, sampling
+                rate and detection interval per camera
+            detector: Existing ParkingDetector to share (model_path is then ignored)
+        """
+        self.detector = detector or ParkingDetector(model_path)
+        self.qos = qos
+    
+    def _next_action(self, cam):
+        return cam.next_frame() if cam else DETECT
+    
+    def _process(self, frame, cam, action, last):
         """
-        self.detector = ParkingDetector(model_path)
+        Detect (or reuse the previous detection) and annotate a frame
+        
+        Args:
+            frame: Input frame
+            cam: CameraQoS for this source, or None
+            action: DETECT or REUSE
+            last: Per-source dict holding the previous results and counts
+            
+        Returns:
+            tuple: (annotated_frame, counts)
+        """
+        if action == REUSE and 'results' in last:
+            return self.detector.annotate(frame, last['results'], last['counts']), last['counts']
+        
+        imgsz = cam.image_size if cam else None
+        results, seconds = self.detector.detect_timed(frame, imgsz)
+        if cam:
+            cam.record(seconds, imgsz)
+        counts = self.detector.count_spaces(results)
+        last['results'], last['counts'] = results, counts
+        return self.detector.annotate(frame, results, counts), counts
         
-    def process_video(self, video_path, output_path=None, display=True):
+    def process_video(self, video_path, output_path=None, display=True, camera_id=None,
+                      clip_dir=None, clip_options=None):
         """
         Process video file and detect parking spaces
         
+        With a QoS controller, frames it skips are not decoded or processed;
+        the output video repeats the last annotated frame in their place so
+        it keeps the source frame rate and duration.
+        
         Args:
-            video_path: Path to input video
-            output_path: Path to save output video (optional)
+            video_path: Path to input video (or a 'sim:' source)
+            output_path: Path to save the whole output video (optional)
             display: Whether to display video while processing
+            camera_id: Name used by the QoS controller (defaults to video_path)
+            clip_dir: Save short clips around occupancy changes here (optional)
+            clip_options: Extra ClipRecorder arguments (pre_seconds, post_seconds, ...)
+            
+        Returns:
+            dict: Frame count, elapsed seconds, average FPS and source
+                frames dropped because processing fell behind (simulated cameras),
+                plus the final QoS plan when a controller is used
         """
-        cap = cv2.VideoCapture(video_path)
+        cap = open_capture(video_path)
         
         if not cap.isOpened():
             raise ValueError(f"Cannot open video: {video_path}")
@@ -44,18 +105,38 @@ class VideoProcessor:
         
         frame_count = 0
         start_time = time.time()
+        cam = self.qos.camera(camera_id or str(video_path), fps) if self.qos else None
+        last = {}
+        last_annotated = None
+        recorder = None
+        if clip_dir:
+            recorder = ClipRecorder(camera_id or Path(str(video_path)).stem, clip_dir,
+                                    fps=fps, **(clip_options or {}))
         
         print(f"Processing video: {video_path}")
         print(f"Resolution: {width}x{height} @ {fps} FPS")
         
         while True:
-            ret, frame = cap.read()
+            action = self._next_action(cam)
+            if action == SKIP:
+                # Advance without decoding
+                if not cap.grab():
+                    break
+                FRAMES_DROPPED.labels('video', 'qos_skip').inc()
+                if writer and last_annotated is not None:
+                    with stage_timer('video', 'encode'):
+                        writer.write(last_annotated)
+                continue
+            
+            with stage_timer('video', 'decode'):
+                ret, frame = cap.read()
             if not ret:
                 break
             
             # Process frame
-            annotated, counts = self.detector.process_frame(frame)
+            annotated, counts = self._process(frame, cam, action, last)
             frame_count += 1
+            FRAMES_PROCESSED.labels('video').inc()
             
             # Calculate FPS
             elapsed = time.time() - start_time
@@ -67,55 +148,124 @@ class VideoProcessor:
             
             # Write frame
             if writer:
-                writer.write(annotated)
+                with stage_timer('video', 'encode'):
+                    writer.write(annotated)
+                last_annotated = annotated
+            
+            # Buffer frame for event clips, using video time
+            if recorder:
+                with stage_timer('video', 'clip_buffer'):
+                    timestamp = start_time + cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                    recorder.update(counts, timestamp)
+                    recorder.push(annotated, timestamp)
             
             # Display frame
             if display:
-                cv2.imshow('ParkVision - Parking Detection', annotated)
-                if cv2.waitKey(1) & 0xFF == ord('q'):
+                with stage_timer('video', 'display'):
+                    cv2.imshow('ParkVision - Parking Detection', annotated)
+                    key = cv2.waitKey(1) & 0xFF
+                if key == ord('q'):
                     break
             
-            # Print progress
-            if frame_count % 30 == 0:
-                print(f"Frame {frame_count}: {counts}")
+            # Report progress
+            log.info('video_progress', frame=frame_count, fps=round(current_fps, 2), **counts)
         
         # Cleanup
+        dropped = getattr(cap, 'dropped_frames', 0)
         cap.release()
+        plan = None
+        if cam:
+            # Final plan, captured before release() drops the camera from QoS
+            plan = {
+                'image_size': cam.image_size,
+                'sample_fps': cam.sample_fps,
+                'detect_interval': cam.detect_interval,
+                'stride': cam.stride
+            }
+            cam.release()
         if writer:
             writer.release()
+        if recorder:
+            recorder.close()
+            recorder.writer.join()
         if display:
             cv2.destroyAllWindows()
         
+        elapsed = time.time() - start_time
+        average_fps = frame_count / elapsed if elapsed > 0 else 0
+        
         print(f"\nProcessing complete!")
         print(f"Total frames: {frame_count}")
-        print(f"Average FPS: {frame_count / elapsed:.2f}")
+        print(f"Average FPS: {average_fps:.2f}")
+        
+        stats = {
+            'frames': frame_count,
+            'elapsed': elapsed,
+            'fps': average_fps,
+            'dropped': dropped
+        }
+        if plan:
+            stats['qos'] = plan
+        return stats
     
-    def process_webcam(self, camera_id=0):
+    def process_webcam(self, camera_id=0, clip_dir=None, clip_options=None):
         """
         Process live webcam feed
         
         Args:
             camera_id: Camera device ID (default: 0)
+            clip_dir: Save short clips around occupancy changes here (optional)
+            clip_options: Extra ClipRecorder arguments (pre_seconds, post_seconds, ...)
         """
-        cap = cv2.VideoCapture(camera_id)
+        cap = open_capture(camera_id)
         
         if not cap.isOpened():
             raise ValueError(f"Cannot open camera: {camera_id}")
         
+        cam = self.qos.camera(f"webcam:{camera_id}", cap.get(cv2.CAP_PROP_FPS)) if self.qos else None
+        last = {}
+        recorder = None
+        if clip_dir:
+            recorder = ClipRecorder(f"webcam{camera_id}", clip_dir,
+                                    fps=cap.get(cv2.CAP_PROP_FPS), **(clip_options or {}))
+        
         print("Starting webcam feed. Press 'q' to quit.")
         
         while True:
-            ret, frame = cap.read()
+            action = self._next_action(cam)
+            if action == SKIP:
+                if not cap.grab():
+                    FRAMES_DROPPED.labels('webcam', 'read_failed').inc()
+                    break
+                FRAMES_DROPPED.labels('webcam', 'qos_skip').inc()
+                continue
+            
+            with stage_timer('webcam', 'decode'):
+                ret, frame = cap.read()
             if not ret:
+                FRAMES_DROPPED.labels('webcam', 'read_failed').inc()
                 break
             
-            annotated, counts = self.detector.process_frame(frame)
+            annotated, counts = self._process(frame, cam, action, last)
+            FRAMES_PROCESSED.labels('webcam').inc()
+            
+            if recorder:
+                with stage_timer('webcam', 'clip_buffer'):
+                    recorder.update(counts)
+                    recorder.push(annotated)
             
-            cv2.imshow('ParkVision - Live Detection', annotated)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+            with stage_timer('webcam', 'display'):
+                cv2.imshow('ParkVision - Live Detection', annotated)
+                key = cv2.waitKey(1) & 0xFF
+            if key == ord('q'):
                 break
         
         cap.release()
+        if cam:
+            cam.release()
+        if recorder:
+            recorder.close()
+            recorder.writer.join()
         cv2.destroyAllWindows()
 
 
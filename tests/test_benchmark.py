@@ -0,0 +1,38 @@
+"""
+Tests for the benchmark summary and regression check
+"""
+import pytest
+
+pytest.importorskip('cv2')
+
+from benchmark import compare, percentile, summarize  # noqa: E402
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+
+    assert percentile(values, 50) == 51
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) == 0.0
+
+
+def test_summarize_uses_wall_time_for_throughput():
+    summary = summarize([0.1, 0.2, 0.3, 0.4], wall_time=0.5)
+
+    assert summary['count'] == 4
+    assert summary['throughput_per_s'] == pytest.approx(8.0)
+    assert summary['max_ms'] == pytest.approx(400.0)
+
+
+def test_compare_flags_slower_p50_and_lower_fps():
+    baseline = {'results': {'detect': {'p50_ms': 10.0}, 'video': {'fps': 20.0}}}
+    current = {'results': {'detect': {'p50_ms': 12.0}, 'video': {'fps': 15.0}}}
+
+    assert len(compare(current, baseline, 0.10)) == 2
+
+
+def test_compare_flags_new_errors_even_when_faster():
+    baseline = {'results': {'api.detect': {'p50_ms': 50.0, 'errors': 0}}}
+    current = {'results': {'api.detect': {'p50_ms': 1.0, 'errors': 100}}}
+
+    assert compare(current, baseline, 0.10) == ['api.detect: errors 0 -> 100']
@@ -0,0 +1,107 @@
+"""
+Tests for the event clip ring buffer and windowing
+"""
+import pytest
+
+np = pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+
+from src.clip_recorder import ClipRecorder, FrameRingBuffer  # noqa: E402
+
+
+def frame_bytes(i):
+    return np.full(4 + i % 3, i, dtype=np.uint8)
+
+
+class FakeWriter:
+    def __init__(self):
+        self.clips = []
+
+    def submit(self, path, frames, metadata):
+        self.clips.append((path, frames, metadata))
+        return True
+
+
+def test_copy_range_after_wraparound():
+    ring = FrameRingBuffer(capacity=4, max_frame_bytes=16)
+    for i in range(10):
+        assert ring.push(frame_bytes(i), float(i)) == i
+
+    assert ring.oldest_seq == 6
+    frames = ring.copy_range(0, ring.next_seq)
+    assert [ts for ts, _ in frames] == [6.0, 7.0, 8.0, 9.0]
+    assert [data for _, data in frames] == [frame_bytes(i).tobytes() for i in range(6, 10)]
+
+
+def test_copy_range_partial_window():
+    ring = FrameRingBuffer(capacity=4, max_frame_bytes=16)
+    for i in range(7):
+        ring.push(frame_bytes(i), float(i))
+
+    assert [ts for ts, _ in ring.copy_range(4, 6)] == [4.0, 5.0]
+    assert ring.first_seq_since(4.5) == 5
+    assert ring.first_seq_since(100.0) == ring.next_seq
+
+
+def test_oversize_frame_rejected():
+    ring = FrameRingBuffer(capacity=2, max_frame_bytes=4)
+
+    assert ring.push(np.zeros(5, dtype=np.uint8), 0.0) == -1
+    assert ring.next_seq == 0
+
+
+def test_clip_covers_pre_and_post_window(tmp_path):
+    writer = FakeWriter()
+    recorder = ClipRecorder('cam', tmp_path, fps=10, pre_seconds=1.0, post_seconds=1.0,
+                            writer=writer)
+    recorder.update({'occupied': 1}, 0.0)
+    for i in range(40):
+        ts = i / 10.0
+        if i == 20:
+            recorder.update({'occupied': 2}, ts)
+        recorder.push_encoded(frame_bytes(i), ts)
+
+    assert len(writer.clips) == 1
+    _, frames, metadata = writer.clips[0]
+    stamps = [ts for ts, _ in frames]
+    assert stamps[0] == pytest.approx(1.0)
+    assert stamps[-1] == pytest.approx(3.0)
+    assert [e['to'] for e in metadata['events']] == [2]
+
+
+def test_window_longer_than_ring_continues_in_new_clip(tmp_path):
+    writer = FakeWriter()
+    recorder = ClipRecorder('cam', tmp_path, fps=10, pre_seconds=1.0, post_seconds=1.0,
+                            writer=writer)
+    recorder.update({'occupied': 1}, 0.0)
+    for i in range(60):
+        ts = i / 10.0
+        if i == 20:
+            recorder.update({'occupied': 2}, ts)
+        if i == 29:
+            recorder.update({'occupied': 3}, ts)
+        recorder.push_encoded(frame_bytes(i), ts)
+
+    assert len(writer.clips) == 2
+    first = [ts for ts, _ in writer.clips[0][1]]
+    second = [ts for ts, _ in writer.clips[1][1]]
+    assert first[0] == pytest.approx(1.0)
+    assert second[0] == pytest.approx(first[-1] + 0.1)
+    # The t=2.9 event still gets its full second of post-event footage
+    assert second[-1] == pytest.approx(3.9)
+    assert [e['to'] for e in writer.clips[1][2]['events']] == [2, 3]
+
+
+def test_auto_sized_ring_accepts_hd_frames(tmp_path):
+    recorder = ClipRecorder('cam', tmp_path, fps=2, pre_seconds=1.0, post_seconds=1.0,
+                            writer=FakeWriter())
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (1080, 1920, 3), dtype=np.uint8)
+    ok, encoded = cv2.imencode('.jpg', frame, recorder.encode_params)
+    assert ok and encoded.size > 128 * 1024
+
+    recorder.push_encoded(encoded, 0.0)
+
+    assert recorder.buffer.next_seq == 1
+    assert recorder.buffer.max_frame_bytes >= 2 * encoded.size
+    assert recorder.buffer.copy_range(0, 1)[0][1] == encoded.tobytes()
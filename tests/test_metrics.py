@@ -0,0 +1,26 @@
+"""
+Tests for the Prometheus text rendering
+"""
+from src.metrics import MetricsRegistry
+
+
+def test_values_render_at_full_precision():
+    metrics = MetricsRegistry()
+    counter = metrics.counter('test_total', 'Counter')
+    histogram = metrics.histogram('test_seconds', 'Histogram', buckets=(0.5,))
+    counter.inc(1234570)
+    counter.inc()
+    histogram.observe(1234.56789)
+
+    lines = metrics.render().splitlines()
+    assert 'test_total 1234571' in lines
+    assert 'test_seconds_sum 1234.56789' in lines
+    assert 'test_seconds_bucket{le="0.5"} 0' in lines
+
+
+def test_gauge_function_read_at_render():
+    metrics = MetricsRegistry()
+    gauge = metrics.gauge('test_bytes', 'Gauge')
+    gauge.set_function(lambda: 987654321)
+
+    assert 'test_bytes 987654321' in metrics.render().splitlines()
@@ -0,0 +1,120 @@
+"""
+Tests for the shared model registry
+"""
+import threading
+import time
+
+import pytest
+
+from src.model_registry import ModelRegistry
+
+
+class FakeModel:
+    def __init__(self, path):
+        self.path = path
+        self.names = {0: 'empty', 1: 'occupied'}
+
+    def __call__(self, image, **kwargs):
+        return [(self.path, image)]
+
+
+class CountingLoader:
+    """Loader that records every load and can fail for chosen paths"""
+
+    def __init__(self, delay=0.0, fail=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, path):
+        with self._lock:
+            self.calls.append(path)
+        time.sleep(self.delay)
+        if path in self.fail:
+            raise FileNotFoundError(path)
+        return FakeModel(path)
+
+
+def test_concurrent_ensure_loads_once():
+    loader = CountingLoader(delay=0.05)
+    models = ModelRegistry(loader)
+    handles = []
+
+    def worker():
+        handles.append(models.ensure('main', 'best.pt'))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert loader.calls == ['best.pt']
+    assert len({id(h) for h in handles}) == 1
+    assert models.get('main').class_names == ['empty', 'occupied']
+
+
+def test_fallback_is_per_slot_and_cleared_by_swap():
+    models = ModelRegistry(CountingLoader(fail={'missing.pt'}))
+    models.ensure('a', 'missing.pt', fallback='yolov8n.pt')
+    models.ensure('b', 'yolov8n.pt')
+
+    assert models.is_fallback('a')
+    assert not models.is_fallback('b')
+
+    models.swap('a', 'v2.pt', version='v2')
+    assert not models.is_fallback('a')
+    assert models.get('a').version == 'v2'
+
+
+def test_failed_swap_keeps_current_model():
+    models = ModelRegistry(CountingLoader(fail={'broken.pt'}))
+    current = models.ensure('main', 'best.pt')
+
+    with pytest.raises(FileNotFoundError):
+        models.swap('main', 'broken.pt')
+    assert models.get('main') is current
+
+
+def test_ensure_without_fallback_raises():
+    models = ModelRegistry(CountingLoader(fail={'missing.pt'}))
+
+    with pytest.raises(FileNotFoundError):
+        models.ensure('main', 'missing.pt')
+
+
+def test_predict_timed_excludes_lock_wait():
+    models = ModelRegistry(CountingLoader())
+    handle = models.ensure('main', 'best.pt')
+
+    handle._lock.acquire()
+    result = {}
+    worker = threading.Thread(target=lambda: result.update(out=handle.predict_timed('img')))
+    worker.start()
+    time.sleep(0.1)
+    handle._lock.release()
+    worker.join()
+
+    results, seconds = result['out']
+    assert results == [('best.pt', 'img')]
+    assert seconds < 0.05
+
+
+def test_downloaded_fallback_shared_between_slots(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    class DownloadingLoader(CountingLoader):
+        def __call__(self, path):
+            model = super().__call__(path)
+            # Like ultralytics fetching a named model into the working directory
+            (tmp_path / path).write_bytes(b'weights')
+            return model
+
+    loader = DownloadingLoader(fail={'a.pt', 'b.pt'})
+    models = ModelRegistry(loader)
+    first = models.ensure('a', 'a.pt', fallback='yolov8n.pt')
+    second = models.ensure('b', 'b.pt', fallback='yolov8n.pt')
+
+    assert first is second
+    assert loader.calls.count('yolov8n.pt') == 1
@@ -0,0 +1,91 @@
+"""
+Tests for the adaptive QoS controller
+"""
+import pytest
+
+from src import qos
+from src.qos import DETECT, REUSE, SIZE_STEP, SKIP, QoSController
+
+
+@pytest.fixture
+def headroom(monkeypatch):
+    """Set the idle CPU fraction the controller sees"""
+    value = {'idle': 0.5}
+    monkeypatch.setattr(qos, 'cpu_headroom', lambda: value['idle'])
+    return value
+
+
+def make_controller(cameras=0, latency=0.2):
+    # 0.2s per detection at 640, re-planned on every frame
+    controller = QoSController(target_latency=1.0, adjust_interval=0)
+    controller.record(latency, 640)
+    for i in range(cameras):
+        controller.camera(f"cam{i}", 30)
+    return controller
+
+
+def test_single_camera_keeps_full_size(headroom):
+    controller = make_controller(cameras=1)
+    cam = controller.camera('cam0')
+
+    assert controller.image_size == 640
+    # 1.25 detections/s meet the target; display sampling stays at 5 FPS
+    assert cam.sample_fps == pytest.approx(5.0)
+    assert cam.stride == 6
+    assert cam.detect_interval == 4
+
+
+def test_eight_cameras_shrink_input(headroom):
+    controller = make_controller(cameras=8)
+
+    assert controller.image_size == 416
+    assert controller._load(controller.image_size, 8) <= controller.utilization
+    assert controller._load(controller.image_size + SIZE_STEP, 8) > controller.utilization
+
+
+def test_size_steps_back_up_one_notch_at_a_time(headroom):
+    controller = make_controller(cameras=8)
+    sizes = [controller.image_size]
+    for i in range(1, 8):
+        controller.release(f"cam{i}")
+        sizes.append(controller.image_size)
+
+    assert sizes[0] == 416
+    assert sizes[-1] == 640
+    assert all(b - a == SIZE_STEP for a, b in zip(sizes, sizes[1:]))
+
+
+def test_overload_steps_down_even_when_budget_fits(headroom):
+    controller = make_controller(cameras=1)
+    headroom['idle'] = 0.05
+    controller.maybe_adjust()
+
+    assert controller.image_size == 640 - SIZE_STEP
+
+
+def test_low_headroom_samples_only_frames_it_detects(headroom):
+    headroom['idle'] = 0.15
+    controller = make_controller(cameras=1)
+    cam = controller.camera('cam0')
+
+    assert cam.detect_interval == 1
+    assert cam.sample_fps == pytest.approx(1.0 / (1.0 - controller.predict_latency(640)))
+
+
+def test_next_frame_pattern(headroom):
+    controller = make_controller(cameras=1)
+    cam = controller.camera('cam0')
+    actions = [cam.next_frame() for _ in range(4 * cam.stride)]
+
+    sampled = actions[::cam.stride]
+    assert sampled == [DETECT, REUSE, REUSE, REUSE]
+    assert all(a == SKIP for i, a in enumerate(actions) if i % cam.stride)
+
+
+def test_unknown_cost_leaves_settings_alone(headroom):
+    controller = QoSController(adjust_interval=0)
+    cam = controller.camera('cam0', 30)
+
+    assert controller.image_size == 640
+    assert cam.stride == 1
+    assert cam.next_frame() == DETECT
@@ -0,0 +1,45 @@
+"""
+Tests for the simulated camera sources
+"""
+import pytest
+
+np = pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+
+from src.sim_camera import SimulatedCamera  # noqa: E402
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / 'v.mp4'
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), 10, (320, 180))
+    for _ in range(5):
+        writer.write(np.zeros((180, 320, 3), dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def test_video_source_keeps_native_size(video):
+    ok, frame = SimulatedCamera.from_source(f"sim:{video}?realtime=false").read()
+
+    assert ok
+    assert frame.shape[:2] == (180, 320)
+
+
+def test_video_source_resized_on_request(video):
+    camera = SimulatedCamera.from_source(f"sim:{video}?width=160&height=90&realtime=false")
+
+    assert camera.read()[1].shape[:2] == (90, 160)
+
+
+def test_absolute_path_and_double_slash_prefix(video):
+    assert video.is_absolute()
+    for source in (f"sim:{video}", f"sim://{video}"):
+        assert SimulatedCamera.from_source(source).read()[0]
+
+
+def test_synthetic_size_and_fps():
+    camera = SimulatedCamera.from_source('sim:320x200@5?realtime=false&frames=2')
+
+    assert camera.read()[1].shape[:2] == (200, 320)
+    assert camera.get(cv2.CAP_PROP_FPS) == 5.0
@@ -0,0 +1,58 @@
+"""
+Tests for the video pipeline with a stub detector and simulated sources
+"""
+import pytest
+
+pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+
+from src import qos  # noqa: E402
+from src.qos import QoSController  # noqa: E402
+from src.video_processor import VideoProcessor  # noqa: E402
+
+
+class StubDetector:
+    """Stands in for ParkingDetector without loading a model"""
+
+    def detect_timed(self, frame, imgsz=None):
+        return object(), 0.2 * ((imgsz or 640) / 640) ** 2
+
+    def count_spaces(self, results):
+        return {'empty': 1, 'occupied': 1, 'total': 2}
+
+    def annotate(self, frame, results, counts):
+        return frame.copy()
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    monkeypatch.setattr(qos, 'cpu_headroom', lambda: 0.5)
+    controller = QoSController(adjust_interval=0)
+    controller.record(0.2, 640)
+    return controller
+
+
+def test_stats_include_final_qos_plan(controller):
+    processor = VideoProcessor(qos=controller, detector=StubDetector())
+    stats = processor.process_video('sim:64x48@30?realtime=false&duration=1&frames=2',
+                                    display=False, camera_id='sim0')
+
+    assert stats['qos'] == {'image_size': 640, 'sample_fps': 5.0, 'detect_interval': 4,
+                            'stride': 6}
+    # Only sampled frames are processed
+    assert stats['frames'] == 5
+    assert controller.snapshot()['cameras'] == {}
+
+
+
+def test_output_video_keeps_source_frame_count(controller, tmp_path):
+    output = tmp_path / 'out.mp4'
+    processor = VideoProcessor(qos=controller, detector=StubDetector())
+    processor.process_video('sim:64x48@30?realtime=false&duration=1&frames=2',
+                            output_path=str(output), display=False)
+
+    cap = cv2.VideoCapture(str(output))
+    written = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    # Skipped slots repeat the last annotated frame
+    assert written == 30